@@ -1,15 +1,7 @@
 # Updated 9/15/2024
-import tkinter as tk
-from tkinter import ttk
-import threading
-from solver import InferenceEngine
-from missionaries_cannibals import MCProblem
-from blocks_world import BWProblem, BWState
-from fifteen_puzzle import FifteenPuzzleProblem
-from sliding_block_puzzle import SlidingBlockPuzzleProblem
-from tower_of_hanoi import TowerOfHanoiProblem
+# A standalone depth-first prototype of the engine; the domains are only
+# imported when it is run as a script
 from abc import ABC, abstractmethod
-from main import *
 
 
 class State(ABC):
@@ -44,3 +44,58 @@ class Problem(ABC):
     @abstractmethod
     def heuristic(self, state):
         pass
+
+    # Optional: whether heuristic() never overestimates the distance to the
+    # goal. Solution caches only store results that rely on it when it does.
+    def heuristic_is_admissible(self):
+        return True
+
+    # Optional: True for states known not to reach the goal, so the engine
+    # reports no solution without searching from them
+    def is_dead_end(self, state):
+        return False
+
+    # Optional compact codec used to key the engine's closed set and parent
+    # table. The default is the identity, so any hashable State still works;
+    # domains override both methods to pack a state into a single int.
+    def encode(self, state):
+        return state
+
+    def decode(self, key):
+        return key
+
+    # Optional: the parameters encoded keys depend on besides the problem
+    # type, e.g. board dimensions. Solution caches key on them.
+    def signature(self):
+        return ()
+
+    # Optional: the number of bytes every int key from encode() fits in, for
+    # searches that keep keys on disk as fixed-width records
+    def key_size(self):
+        raise NotImplementedError(
+            f"{type(self).__name__} does not have fixed-width keys")
+
+    # Optional: moves from `state` to the goal computed without searching,
+    # as a list or any lazy sequence, for InferenceEngine(algorithm="direct")
+    def direct_solution(self, state):
+        raise NotImplementedError(
+            f"{type(self).__name__} has no direct solution")
+
+    # Optional: (width, height, linear_conflicts) for tile puzzles whose
+    # states keep a `board` list and whose goal is list(range(width *
+    # height)), for InferenceEngine(algorithm="batched"). linear_conflicts
+    # says whether heuristic() adds them to the Manhattan distance.
+    def tile_layout(self):
+        raise NotImplementedError(
+            f"{type(self).__name__} is not a tile puzzle")
+
+    # Optional hooks for searches that run backwards from the goal; domains
+    # whose moves are reversible only need to provide invert_move.
+    def invert_move(self, state, move):
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support inverting moves")
+
+    def get_predecessor_moves(self, state):
+        # (predecessor, move) pairs such that apply_move(predecessor, move) == state
+        return [(self.apply_move(state, move), self.invert_move(state, move))
+                for move in self.get_possible_moves(state)]
@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+from collections.abc import Mapping
+from multiprocessing.connection import wait
+
+# Grace period on top of the engine's own timeout before a worker that has
+# not answered is killed and replaced
+KILL_GRACE = 1.0
+POLL_INTERVAL = 0.1
+
+
+def _worker(connection, engine_class, engine_options):
+    while True:
+        task = connection.recv()
+        if task is None:
+            return
+        _, problem = task
+        connection.send(engine_class(problem, **engine_options).solve())
+
+
+def solve_many(engine_class, problems, workers, engine_options):
+    # Each worker process has its own pipe, so killing one that overruns its
+    # timeout cannot corrupt a queue shared with the others. Instances are
+    # pulled lazily, at most one in flight per worker.
+    context = multiprocessing.get_context()
+    timeout = engine_options.get("timeout")
+    if isinstance(problems, Mapping):
+        instances = iter(problems.items())
+    else:
+        instances = enumerate(problems)
+
+    def spawn():
+        connection, child_connection = context.Pipe()
+        process = context.Process(
+            target=_worker, daemon=True,
+            args=(child_connection, engine_class, engine_options))
+        process.start()
+        child_connection.close()
+        return connection, process
+
+    def kill(worker):
+        worker[0].close()
+        worker[1].terminate()
+        worker[1].join()
+
+    free = [spawn() for _ in range(workers)]
+    # connection -> (worker, instance id, start time)
+    busy = {}
+    exhausted = False
+    try:
+        while True:
+            while free and not exhausted:
+                instance = next(instances, None)
+                if instance is None:
+                    exhausted = True
+                    break
+                worker = free.pop()
+                worker[0].send(instance)
+                busy[worker[0]] = (worker, instance[0], time.time())
+            if not busy:
+                return
+
+            for connection in wait(list(busy), timeout=POLL_INTERVAL):
+                worker, instance_id, started = busy.pop(connection)
+                try:
+                    solution, moves, time_taken = connection.recv()
+                except EOFError:
+                    # The worker died mid-solve; report it like a failed search
+                    kill(worker)
+                    free.append(spawn())
+                    yield instance_id, None, 0, time.time() - started
+                    continue
+                free.append(worker)
+                yield instance_id, solution, moves, time_taken
+
+            if timeout is None:
+                continue
+            now = time.time()
+            for connection, (worker, instance_id, started) in list(busy.items()):
+                if now - started > timeout + KILL_GRACE:
+                    del busy[connection]
+                    kill(worker)
+                    free.append(spawn())
+                    yield instance_id, None, 0, now - started
+    finally:
+        for connection, process in free:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for worker, _, _ in busy.values():
+            kill(worker)
@@ -0,0 +1,109 @@
+from fifteen_puzzle import line_conflicts
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Batched expansion for the tile puzzles (InferenceEngine(algorithm="batched")).
+# Boards are rows of a 2-D uint8 array, one cell per column, with the goal
+# convention of pattern_database.py: the blank at index 0 and tile t at index
+# t. A whole block of frontier nodes is expanded at once: children come from
+# a blank-neighbour table, keys are packed and heuristics summed through
+# lookup tables, all as array operations. Only the duplicate check against
+# the table of known states is left to a Python loop.
+
+
+class TileBatch:
+    def __init__(self, width, height, linear_conflicts=False):
+        if np is None:
+            raise ImportError("algorithm='batched' needs NumPy")
+        self.width = width
+        self.height = height
+        num_cells = width * height
+        self.num_cells = num_cells
+        cells = np.arange(num_cells)
+
+        # neighbours[cell] = the cells the blank can move to, -1 padded
+        neighbours = np.full((num_cells, 4), -1, dtype=np.intp)
+        for cell in range(num_cells):
+            row, col = divmod(cell, width)
+            options = []
+            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                if 0 <= row + dr < height and 0 <= col + dc < width:
+                    options.append((row + dr) * width + col + dc)
+            neighbours[cell, :len(options)] = options
+        self.neighbours = neighbours
+
+        # manhattan[cell, tile], 0 for the blank
+        rows, cols = np.divmod(cells, width)
+        self.manhattan = (np.abs(rows[:, None] - rows[None, :]) +
+                          np.abs(cols[:, None] - cols[None, :])).astype(np.int32)
+        self.manhattan[:, 0] = 0
+
+        # Linear conflicts as FifteenPuzzleState counts them, looked up per
+        # line with fifteen_puzzle.line_conflicts precomputed. A line is coded
+        # in base (length + 1) with one digit per cell, 0 for a tile from
+        # another line, else 1 + the tile's goal place along the line.
+        self.linear_conflicts = linear_conflicts
+        if linear_conflicts:
+            tiles = cells[None, :]
+            in_row = (tiles // width == rows[:, None]) & (tiles != 0)
+            in_col = (tiles % width == cols[:, None]) & (tiles != 0)
+            self.row_code = np.where(in_row, (tiles % width + 1) * (width + 1) ** cols[:, None], 0)
+            self.col_code = np.where(in_col, (tiles // width + 1) * (height + 1) ** rows[:, None], 0)
+            self.row_conflicts = self._conflict_table(width)
+            self.col_conflicts = self._conflict_table(height)
+
+        # Keys: 4 bits per tile up to 16 cells, the problems' own encoding,
+        # so they fit one uint64; bigger boards use the raw board bytes
+        self.packed = num_cells <= 16
+        if self.packed:
+            self.shifts = (4 * (num_cells - 1 - cells)).astype(np.uint64)
+
+    @staticmethod
+    def _conflict_table(length):
+        table = np.zeros((length + 1) ** length, dtype=np.int32)
+        for code in range(len(table)):
+            places = [(code // (length + 1) ** place) % (length + 1)
+                      for place in range(length)]
+            table[code] = line_conflicts([place for place in places if place])
+        return 2 * table
+
+    def boards(self, states):
+        return np.array([state.board for state in states], dtype=np.uint8)
+
+    def keys(self, boards):
+        if self.packed:
+            return np.bitwise_or.reduce(
+                boards.astype(np.uint64) << self.shifts, axis=1).tolist()
+        return boards.view(f"V{self.num_cells}").ravel().tolist()
+
+    def decode(self, keys):
+        if self.packed:
+            packed = np.array(keys, dtype=np.uint64)
+            return ((packed[:, None] >> self.shifts) & np.uint64(15)).astype(np.uint8)
+        return np.frombuffer(b"".join(bytes(key) for key in keys),
+                             dtype=np.uint8).reshape(len(keys), self.num_cells)
+
+    def heuristic(self, boards):
+        cells = np.arange(self.num_cells)
+        h = self.manhattan[cells, boards].sum(axis=1)
+        if self.linear_conflicts:
+            shape = (len(boards), self.height, self.width)
+            rows = self.row_code[cells, boards].reshape(shape).sum(axis=2)
+            cols = self.col_code[cells, boards].reshape(shape).sum(axis=1)
+            h += self.row_conflicts[rows].sum(axis=1) + self.col_conflicts[cols].sum(axis=1)
+        return h
+
+    def expand(self, boards):
+        # Every child of every board: (index of its parent row, the cell the
+        # blank moved to, i.e. the scalar move, and the child boards)
+        blanks = np.argmin(boards, axis=1)
+        targets = self.neighbours[blanks]
+        parents, slots = np.nonzero(targets >= 0)
+        moves = targets[parents, slots]
+        children = boards[parents]
+        rows = np.arange(len(children))
+        children[rows, blanks[parents]] = children[rows, moves]
+        children[rows, moves] = 0
+        return parents, moves, children
@@ -0,0 +1,210 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+from solver import InferenceEngine
+from missionaries_cannibals import MCProblem
+from blocks_world import BWProblem, BWState
+from fifteen_puzzle import FifteenPuzzleProblem
+from sliding_block_puzzle import SlidingBlockPuzzleProblem
+from tower_of_hanoi import TowerOfHanoiProblem
+
+# Every instance is built from a fixed seed, so two runs of the same suite
+# always solve the same problems. Each instance is solved in a fresh process
+# so that its peak RSS is not inflated by the instances before it.
+
+FORMAT_VERSION = 1
+METRICS = ("expanded", "time", "peak_memory", "solution_length")
+# Beyond the engine's timeout, for building the problem and reporting back;
+# an instance process still running after that is terminated
+GRACE = 30.0
+
+
+def random_blocks_state(rng, num_blocks, peg_names=("A", "B", "C")):
+    pegs = {name: [] for name in peg_names}
+    blocks = [chr(ord("a") + i) for i in range(num_blocks)]
+    rng.shuffle(blocks)
+    for block in blocks:
+        pegs[rng.choice(peg_names)].append(block)
+    return BWState(pegs)
+
+
+def blocks_world_problem(num_blocks, seed):
+    rng = random.Random(seed)
+    return BWProblem(random_blocks_state(rng, num_blocks),
+                     random_blocks_state(rng, num_blocks))
+
+
+def build_suite(name):
+    # List of (instance id, picklable zero-argument factory)
+    if name == "blocks":
+        # Larger Blocks World instances: optimal search reaches 10 blocks,
+        # 20 and 40 are for --algorithm anytime or direct
+        return [(f"blocks-{num_blocks}-s{seed}", functools.partial(
+            blocks_world_problem, num_blocks, seed))
+            for num_blocks in (10, 20, 40) for seed in range(3)]
+    instances = [("mc", MCProblem)]
+    full = name == "full"
+    for num_blocks in range(3, 7 if full else 6):
+        for seed in range(3):
+            instances.append((f"blocks-{num_blocks}-s{seed}", functools.partial(
+                blocks_world_problem, num_blocks, seed)))
+    for num_disks in range(3, 13 if full else 9):
+        instances.append((f"hanoi-{num_disks}", functools.partial(
+            TowerOfHanoiProblem, num_disks)))
+    for seed in range(10 if full else 5):
+        instances.append((f"8puzzle-s{seed}", functools.partial(
+            SlidingBlockPuzzleProblem, 3, 3, seed=seed, scramble_moves=200)))
+    for seed in range(10 if full else 3):
+        instances.append((f"15puzzle-s{seed}", functools.partial(
+            FifteenPuzzleProblem, seed=seed, scramble_moves=60)))
+    for width, height in [(4, 3), (5, 2), (3, 5)]:
+        for seed in range(5 if full else 2):
+            instances.append((f"sliding-{width}x{height}-s{seed}", functools.partial(
+                SlidingBlockPuzzleProblem, width, height, seed=seed, scramble_moves=60)))
+    return instances
+
+
+def _solve_instance(connection, factory, engine_options):
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            problem = factory()
+        engine = InferenceEngine(problem, **engine_options)
+        engine.solve()
+        connection.send(engine.summary.as_dict())
+    except Exception as e:
+        connection.send({"error": f"{type(e).__name__}: {e}"})
+    connection.close()
+
+
+def run_suite(suite, engine_options):
+    context = multiprocessing.get_context()
+    results = []
+    for instance_id, factory in build_suite(suite):
+        connection, child_connection = context.Pipe(duplex=False)
+        process = context.Process(target=_solve_instance,
+                                  args=(child_connection, factory, engine_options))
+        process.start()
+        child_connection.close()
+        limit = engine_options.get("timeout", 120) + GRACE
+        summary = None
+        try:
+            if connection.poll(limit):
+                summary = connection.recv()
+        except (EOFError, OSError):
+            # Killed without reporting, e.g. by the OOM killer or a crash
+            process.join()
+            summary = {"error": f"Solver process died (exit code {process.exitcode})"}
+        if summary is None:
+            process.terminate()
+            summary = {"error": f"No result after {limit:.0f} seconds; terminated"}
+        process.join()
+        connection.close()
+        if "error" in summary:
+            results.append({"id": instance_id, "solved": False,
+                            "error": summary["error"]})
+            print(json.dumps(results[-1]), file=sys.stderr)
+            continue
+        results.append({
+            "id": instance_id,
+            "solved": summary["solution_length"] is not None,
+            "expanded": summary["expanded"],
+            "time": summary["elapsed"],
+            "nodes_per_second": summary["expansions_per_second"],
+            "peak_memory": summary["peak_memory"],
+            "solution_length": summary["solution_length"],
+        })
+        print(json.dumps(results[-1]), file=sys.stderr)
+    return {
+        "format": FORMAT_VERSION,
+        "suite": suite,
+        "engine": engine_options,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    # Returns a list of human-readable regressions of `current`
+    regressions = []
+    baseline_results = {result["id"]: result for result in baseline["results"]}
+    for result in current["results"]:
+        old = baseline_results.get(result["id"])
+        if old is None:
+            continue
+        if old["solved"] and not result["solved"]:
+            regressions.append(f"{result['id']}: no longer solved"
+                               + (f" ({result['error']})" if "error" in result else ""))
+            continue
+        if not result["solved"] or "error" in old:
+            continue
+        for metric in METRICS:
+            before, after = old[metric], result[metric]
+            if before is None or after is None:
+                continue
+            if metric == "solution_length":
+                if after > before:
+                    regressions.append(
+                        f"{result['id']}: solution_length {before} -> {after}")
+            elif after > before * (1 + threshold) and after - before > _noise_floor(metric):
+                regressions.append(
+                    f"{result['id']}: {metric} {before:.4g} -> {after:.4g} "
+                    f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+def _noise_floor(metric):
+    # Ignore absolute changes too small to mean anything
+    return {"expanded": 0, "time": 0.05, "peak_memory": 1 << 20}[metric]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solver benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run a suite and write JSON results")
+    run.add_argument("--suite", choices=["quick", "full", "blocks"], default="quick")
+    run.add_argument("--algorithm", choices=InferenceEngine.ALGORITHMS, default="astar")
+    run.add_argument("--max-moves", type=int, default=200000)
+    run.add_argument("--timeout", type=float, default=60)
+    run.add_argument("--output", default="-")
+    check = commands.add_parser("compare", help="Flag regressions against a baseline")
+    check.add_argument("baseline")
+    check.add_argument("current")
+    check.add_argument("--threshold", type=float, default=0.15,
+                       help="Relative increase treated as a regression")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_suite(args.suite, {"algorithm": args.algorithm,
+                                        "max_moves": args.max_moves,
+                                        "timeout": args.timeout})
+        text = json.dumps(report, indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for regression in regressions:
+        print(regression)
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,72 @@
 from base_classes import State, Problem
+import random
+from string import ascii_lowercase, ascii_uppercase
 # Update 9/15/2024
 
 
 class BWState(State):
+    # Canonical form: peg names in sorted order and one tuple per peg, bottom
+    # block first, so equal arrangements hash alike whatever order the pegs
+    # were given in. Successors share every stack they do not touch.
     def __init__(self, pegs):
-        self.pegs = pegs
+        names = tuple(sorted(pegs))
+        self.names = names
+        self.stacks = tuple(tuple(pegs[name]) for name in names)
+
+    @classmethod
+    def from_stacks(cls, names, stacks):
+        state = cls.__new__(cls)
+        state.names = names
+        state.stacks = stacks
+        return state
+
+    @property
+    def pegs(self):
+        return {name: list(stack) for name, stack in zip(self.names, self.stacks)}
 
     def is_valid(self):
-        return len(self.pegs) == 3 and all(isinstance(peg, list) for peg in self.pegs.values())
+        blocks = [block for stack in self.stacks for block in stack]
+        return len(self.stacks) >= 1 and len(blocks) == len(set(blocks))
 
     def is_goal(self, goal_state):
-        return self.pegs == goal_state.pegs
+        return self.stacks == goal_state.stacks and self.names == goal_state.names
 
     def __eq__(self, other):
-        return isinstance(other, BWState) and self.pegs == other.pegs
+        return isinstance(other, BWState) and self.stacks == other.stacks and \
+            self.names == other.names
 
     def __hash__(self):
-        return hash(tuple(tuple(peg) for peg in self.pegs.values()))
+        return hash(self.stacks)
 
     def __str__(self):
-        return " | ".join([f"{k}: {v}" for k, v in self.pegs.items()])
+        return " | ".join([f"{k}: {list(v)}" for k, v in zip(self.names, self.stacks)])
 
 
 class BWProblem(Problem):
     def __init__(self, initial_state, goal_state):
-        self._initial_state = initial_state
-        self._goal_state = goal_state
+        # Any number of pegs; a peg named in only one of the two states is
+        # empty in the other
+        names = tuple(sorted(set(initial_state.names) | set(goal_state.names)))
+        self._initial_state = self._normalise(initial_state, names)
+        self._goal_state = self._normalise(goal_state, names)
+        self._peg_names = list(names)
+        self._peg_index = {name: i for i, name in enumerate(names)}
+        self._blocks = sorted(
+            block for stack in initial_state.stacks for block in stack)
+        self._block_index = {block: i for i, block in enumerate(self._blocks)}
+        self._bits = (len(self._blocks) + len(self._peg_names)).bit_length()
+        # Where each block goes: (peg index, height) in the goal
+        self._goal_position = {}
+        for peg_index, stack in enumerate(self._goal_state.stacks):
+            for height, block in enumerate(stack):
+                self._goal_position[block] = (peg_index, height)
+
+    @staticmethod
+    def _normalise(state, names):
+        if state.names == names:
+            return state
+        pegs = state.pegs
+        return BWState({name: pegs.get(name, []) for name in names})
 
     def get_initial_state(self):
         return self._initial_state
@@ -35,28 +76,163 @@ class BWProblem(Problem):
 
     def get_possible_moves(self, state):
         moves = []
-        for source in state.pegs:
-            if state.pegs[source]:
-                for destination in state.pegs:
+        names = state.names
+        for source, stack in enumerate(state.stacks):
+            if stack:
+                for destination in range(len(names)):
                     if source != destination:
-                        moves.append((source, destination))
+                        moves.append((names[source], names[destination]))
         return moves
 
     def apply_move(self, state, move):
+        source, destination = self._peg_index[move[0]], self._peg_index[move[1]]
+        stacks = list(state.stacks)
+        block = stacks[source][-1]
+        stacks[source] = stacks[source][:-1]
+        stacks[destination] = stacks[destination] + (block,)
+        return BWState.from_stacks(state.names, tuple(stacks))
+
+    def encode(self, state):
+        # One field per block saying what it rests on: the index of the block
+        # below it, or len(blocks) + peg index when it is on the table
+        num_blocks = len(self._blocks)
+        block_index = self._block_index
+        bits = self._bits
+        key = 0
+        for peg_index, stack in enumerate(state.stacks):
+            below = num_blocks + peg_index
+            for block in stack:
+                index = block_index[block]
+                key |= below << (bits * index)
+                below = index
+        return key
+
+    def decode(self, key):
+        num_blocks = len(self._blocks)
+        mask = (1 << self._bits) - 1
+        above = {}
+        for index in range(num_blocks):
+            above[(key >> (self._bits * index)) & mask] = index
+        stacks = []
+        for peg_index in range(len(self._peg_names)):
+            stack = []
+            below = num_blocks + peg_index
+            while below in above:
+                below = above[below]
+                stack.append(self._blocks[below])
+            stacks.append(tuple(stack))
+        return BWState.from_stacks(tuple(self._peg_names), tuple(stacks))
+
+    def signature(self):
+        return (tuple(self._peg_names), tuple(self._blocks))
+
+    def invert_move(self, state, move):
         source, destination = move
-        new_pegs = {k: v[:] for k, v in state.pegs.items()}
-        block = new_pegs[source].pop()
-        new_pegs[destination].append(block)
-        return BWState(new_pegs)
+        return (destination, source)
 
     def get_move_description(self, move, state):
         source, destination = move
         return f"Move top block from {source} to {destination}"
 
     def heuristic(self, state):
-        misplaced = 0
-        for peg in self._goal_state.pegs:
-            for i, block in enumerate(self._goal_state.pegs[peg]):
-                if i >= len(state.pegs[peg]) or state.pegs[peg][i] != block:
-                    misplaced += 1
-        return misplaced
+        # Admissible count of moves per block. A block resting on its goal
+        # prefix never has to move. Any other block moves at least once, and
+        # at least twice when a block below it belongs below it in the goal
+        # on the same peg: it has to leave before that block (or the blocks
+        # between them in the goal) can be placed, then come back.
+        goal_position = self._goal_position
+        estimate = 0
+        for peg_index, stack in enumerate(state.stacks):
+            settled = True
+            # Lowest goal height, per goal peg, among the blocks seen so far
+            lowest = {}
+            for height, block in enumerate(stack):
+                goal_peg, goal_height = goal_position[block]
+                settled = settled and goal_peg == peg_index and goal_height == height
+                if not settled:
+                    below = lowest.get(goal_peg)
+                    estimate += 2 if below is not None and below < goal_height else 1
+                if goal_peg not in lowest or goal_height < lowest[goal_peg]:
+                    lowest[goal_peg] = goal_height
+        return estimate
+
+    def direct_solution(self, state):
+        # A valid, not optimal, plan in O(blocks^2) moves without search:
+        # stack everything on one peg in a fixed order, then undo the same
+        # construction run from the goal. The order starts with the tallest
+        # goal stack so that part of the goal is never taken apart.
+        goal = self._goal_state
+        if len(goal.names) < 3:
+            raise ValueError("Direct moves need at least three pegs")
+        if sorted(block for stack in state.stacks for block in stack) != self._blocks:
+            return None
+        state = self._normalise(state, goal.names)
+        peg = max(range(len(goal.stacks)), key=lambda i: len(goal.stacks[i]))
+        rest = set(self._blocks) - set(goal.stacks[peg])
+        order = goal.stacks[peg] + tuple(sorted(rest))
+        forward = self._gather(state, peg, order)
+        backward = self._gather(goal, peg, order)
+        moves = []
+        for source, destination in forward + [(d, s) for s, d in reversed(backward)]:
+            # Where the two halves meet a block may go straight back
+            if moves and moves[-1] == (destination, source):
+                moves.pop()
+            else:
+                moves.append((source, destination))
+        return moves
+
+    def _gather(self, state, peg, order):
+        # Moves that stack every block on `peg` in `order`, bottom first,
+        # keeping whatever already sits there in that order
+        names = state.names
+        stacks = [list(stack) for stack in state.stacks]
+        others = [i for i in range(len(stacks)) if i != peg]
+        moves = []
+
+        def move(source, destination):
+            stacks[destination].append(stacks[source].pop())
+            moves.append((names[source], names[destination]))
+
+        def spare(source):
+            return min((i for i in others if i != source), key=lambda i: len(stacks[i]))
+
+        settled = 0
+        while settled < len(stacks[peg]) and stacks[peg][settled] == order[settled]:
+            settled += 1
+        while len(stacks[peg]) > settled:
+            move(peg, spare(peg))
+        for block in order[settled:]:
+            source = next(i for i in others if block in stacks[i])
+            while stacks[source][-1] != block:
+                move(source, spare(source))
+            move(source, peg)
+        return moves
+
+
+def _labels(letters, count):
+    # a, b, ... while they last, then a0, a1, ...
+    if count <= len(letters):
+        return list(letters[:count])
+    return [f"{letters[0]}{i}" for i in range(count)]
+
+
+def make_blocks_world(num_blocks=3, num_pegs=3, seed=None):
+    # Without a seed: every block stacked on the first peg, to be dealt out
+    # one per peg in turn. With one: both arrangements random.
+    blocks = _labels(ascii_lowercase, num_blocks)
+    names = _labels(ascii_uppercase, num_pegs)
+    if seed is None:
+        initial = {name: [] for name in names}
+        initial[names[0]] = blocks
+        goal = {name: blocks[i::num_pegs] for i, name in enumerate(names)}
+        return BWProblem(BWState(initial), BWState(goal))
+    rng = random.Random(seed)
+    states = []
+    for _ in range(2):
+        pegs = {name: [] for name in names}
+        order = blocks[:]
+        rng.shuffle(order)
+        for block in order:
+            pegs[rng.choice(names)].append(block)
+        states.append(BWState(pegs))
+    return BWProblem(*states)
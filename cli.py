@@ -0,0 +1,195 @@
+import argparse
+import itertools
+import json
+import sys
+import registry
+from solver import InferenceEngine, solution_length
+
+# Headless solver: one JSON line per instance on stdout, as each finishes.
+#
+#   python cli.py solve --problem fifteen --seed 7 --timeout 30
+#   python cli.py solve --problem fifteen --heuristic pdb --board 1,5,2,...
+#   python cli.py solve --instances instances.jsonl
+#   python instances.py 4 4 --count 10 | python cli.py solve --instances -
+#   python cli.py list
+#
+# Instance lines are JSON objects: {"problem": name, "params": {...}} with
+# optional "id" (default: the line number) and "algorithm". The tile
+# puzzles' "board" (a list of tiles, the blank as 0) and "heuristic"
+# ("manhattan" or "pdb") may also be given next to "params" rather than in
+# it. The exit code is that of the worst outcome across all instances.
+#
+# Records list at most --move-limit moves, taken lazily from the solution,
+# and say "moves_truncated" when there were more: a streamed solution such
+# as Hanoi's can be far too long to print. stats.peak_memory is the peak
+# resident size during that solve on Linux; elsewhere it is the process
+# peak so far, which only grows across the instances of one run.
+
+MOVE_LIMIT = 100000
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_NO_SOLUTION = 3
+EXIT_LIMIT = 4
+# Worst first
+SEVERITY = (EXIT_ERROR, EXIT_LIMIT, EXIT_NO_SOLUTION, EXIT_OK)
+EXIT_CODES = {"solved": EXIT_OK, "no_solution": EXIT_NO_SOLUTION,
+              "timeout": EXIT_LIMIT, "max_moves": EXIT_LIMIT,
+              "cancelled": EXIT_LIMIT, "error": EXIT_ERROR}
+
+
+def outcome(engine, solution):
+    # Why a solve ended: the engine returns None for every kind of failure
+    stats = engine.summary
+    if solution is not None:
+        return "solved"
+    if stats.cancelled:
+        return "cancelled"
+    if stats.elapsed >= engine.timeout:
+        return "timeout"
+    if stats.expanded >= engine.max_moves:
+        return "max_moves"
+    return "no_solution"
+
+
+def solve_instance(instance_id, name, params, algorithm, engine_options,
+                   include_moves=True, move_limit=MOVE_LIMIT):
+    record = {"id": instance_id, "problem": name, "params": params}
+    try:
+        spec = registry.get(name)
+        record["params"] = params = spec.parse(params)
+        problem = spec.load()(**params)
+        engine = InferenceEngine(problem, algorithm=algorithm or spec.algorithm,
+                                 **engine_options)
+        solution, _, _ = engine.solve()
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+        return record
+    record.update(result(engine, solution, include_moves, move_limit))
+    return record
+
+
+def result(engine, solution, include_moves=True, move_limit=MOVE_LIMIT):
+    length = None if solution is None else solution_length(solution)
+    record = {"status": outcome(engine, solution), "algorithm": engine.algorithm,
+              "length": length}
+    if include_moves:
+        record["moves"] = None if solution is None else \
+            list(itertools.islice(solution, move_limit))
+        record["moves_truncated"] = length is not None and length > move_limit
+    record["stats"] = engine.summary.as_dict()
+    return record
+
+
+def read_instances(lines):
+    # Yields (id, problem, params, algorithm), or an error record for a line
+    # that cannot be used
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            instance = json.loads(line)
+            if not isinstance(instance, dict) or "problem" not in instance:
+                raise ValueError('expected an object with "problem"')
+            params = instance.get("params", {})
+            if not isinstance(params, dict):
+                raise ValueError('"params" must be an object')
+            params = dict(params, **{field: instance[field] for field
+                                     in ("board", "heuristic") if field in instance})
+        except ValueError as e:
+            yield {"id": number, "status": "error",
+                   "error": f"Bad instance on line {number}: {e}"}
+            continue
+        yield (instance.get("id", number), instance["problem"], params,
+               instance.get("algorithm"))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless problem solver")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Print the problems and their parameters")
+    solve = commands.add_parser("solve", help="Solve instances, one JSON line each")
+    source = solve.add_mutually_exclusive_group(required=True)
+    source.add_argument("--problem", choices=sorted(registry.PROBLEMS))
+    source.add_argument("--instances", metavar="FILE",
+                        help="JSONL instance file, - for stdin")
+    solve.add_argument("--algorithm", choices=InferenceEngine.ALGORITHMS,
+                       help="Default: the problem's own")
+    solve.add_argument("--timeout", type=float, default=120)
+    solve.add_argument("--max-moves", type=int, default=10000)
+    solve.add_argument("--cache", metavar="PATH",
+                       help="Answer repeated instances from this solution cache")
+    solve.add_argument("--no-moves", action="store_true",
+                       help="Leave the moves out of the output")
+    solve.add_argument("--move-limit", type=int, default=MOVE_LIMIT, metavar="N",
+                       help="List at most this many moves per solution")
+    solve.add_argument("--profile", action="store_true",
+                       help="Time the problem's calls into stats.timings")
+    # Every parameter any problem declares; the chosen problem checks them
+    params = {}
+    for spec in registry.PROBLEMS.values():
+        for param in spec.params:
+            params.setdefault(param.name, param)
+    group = solve.add_argument_group("problem parameters")
+    for name, param in sorted(params.items()):
+        flag = "--" + name.replace("_", "-")
+        if param.kind == "choice":
+            group.add_argument(flag, dest="param_" + name, choices=param.choices,
+                               help=f"{param.label} (default: {param.default})")
+        elif param.kind == "board":
+            group.add_argument(flag, dest="param_" + name, metavar="TILES",
+                               help=f"{param.label}, comma separated")
+        else:
+            group.add_argument(flag, dest="param_" + name, metavar="N",
+                               help=param.label)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "list":
+        for spec in registry.PROBLEMS.values():
+            print(json.dumps(spec.as_dict()))
+        return EXIT_OK
+
+    engine_options = {"timeout": args.timeout, "max_moves": args.max_moves,
+                      "profile": args.profile}
+    if args.cache:
+        from solution_cache import SolutionCache
+        engine_options["cache"] = SolutionCache(args.cache)
+    if args.problem:
+        params = {name[len("param_"):]: value for name, value in vars(args).items()
+                  if name.startswith("param_") and value is not None}
+        instances = [(1, args.problem, params, args.algorithm)]
+    elif args.instances == "-":
+        instances = read_instances(sys.stdin)
+    else:
+        try:
+            handle = open(args.instances)
+        except OSError as e:
+            print(f"cli.py: {e}", file=sys.stderr)
+            return EXIT_USAGE
+        instances = read_instances(handle)
+
+    worst = EXIT_OK
+    try:
+        for instance in instances:
+            if isinstance(instance, dict):
+                record = instance
+            else:
+                instance_id, name, params, algorithm = instance
+                record = solve_instance(instance_id, name, params,
+                                        algorithm or args.algorithm,
+                                        engine_options, not args.no_moves,
+                                        args.move_limit)
+            print(json.dumps(record), flush=True)
+            code = EXIT_CODES[record["status"]]
+            if SEVERITY.index(code) < SEVERITY.index(worst):
+                worst = code
+    except KeyboardInterrupt:
+        return 130
+    return worst
+
+
+if __name__ == "__main__":
+    sys.exit(main())
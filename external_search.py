@@ -0,0 +1,223 @@
+import heapq
+import math
+import mmap
+import os
+import shutil
+import tempfile
+import time
+
+# External-memory breadth-first search for problems whose moves are
+# reversible and whose keys have a fixed width (Problem.key_size). Every BFS
+# layer is a file of sorted, distinct, big-endian keys. A layer is expanded
+# by streaming it from disk; children collect in a bounded buffer that is
+# sorted and written out as a run file whenever it fills. The runs are then
+# merged into the next layer while the two previous layers are subtracted.
+# This is delayed duplicate detection: in an undirected graph every
+# neighbour of layer d lies in layer d - 1, d or d + 1, so nothing older
+# has to be kept.
+
+READ_CHUNK = 1 << 16  # records per sequential read
+# A buffered key costs a Python int plus its list slot on top of its bytes
+BUFFER_RECORD_OVERHEAD = 64
+
+
+class ExternalSearch:
+    def __init__(self, problem, work_dir=None, buffer_size=16 * 2 ** 20,
+                 stats=None, report=None, report_every=1000):
+        self.problem = problem
+        self.record_size = problem.key_size()
+        self.buffer_records = max(
+            1, buffer_size // (self.record_size + BUFFER_RECORD_OVERHEAD))
+        self.directory = tempfile.mkdtemp(prefix="layers-", dir=work_dir)
+        # Optional telemetry.SearchStats to keep current and a callable to
+        # run every `report_every` expansions
+        self.stats = stats
+        self.report = report
+        self.report_every = report_every
+        # One {"depth", "states", "runs", "bytes_read", "bytes_written",
+        # "elapsed"} entry per layer written
+        self.layers = []
+        self.expanded = 0
+        # Lowest f pruned by the bound, i.e. the next bound worth trying
+        self.next_bound = math.inf
+        self.goal_depth = None
+        self._bytes_read = 0
+        self._bytes_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _layer_path(self, depth):
+        return os.path.join(self.directory, f"layer-{depth}.bin")
+
+    def _read(self, path):
+        size = self.record_size
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(size * READ_CHUNK)
+                if not data:
+                    return
+                self._bytes_read += len(data)
+                for i in range(0, len(data), size):
+                    yield int.from_bytes(data[i:i + size], "big")
+
+    def _write(self, path, keys):
+        # Writes sorted keys, dropping repeats; returns how many were written
+        size = self.record_size
+        count = 0
+        previous = None
+        out = bytearray()
+        with open(path, "wb") as f:
+            for key in keys:
+                if key == previous:
+                    continue
+                previous = key
+                out += key.to_bytes(size, "big")
+                count += 1
+                if len(out) >= size * READ_CHUNK:
+                    f.write(out)
+                    self._bytes_written += len(out)
+                    out = bytearray()
+            f.write(out)
+            self._bytes_written += len(out)
+        return count
+
+    def run(self, bound=None, max_moves=math.inf, deadline=math.inf,
+            stop_at_goal=True):
+        # Searches layer by layer until the goal's layer is written; states
+        # with g + h > bound are pruned when a bound is given. Returns the
+        # goal depth, or None when the space (within the bound) is exhausted
+        # or a limit is hit; `limited` tells the two apart. With
+        # stop_at_goal=False the whole reachable space is enumerated and
+        # self.layers holds its layer sizes.
+        problem = self.problem
+        encode = problem.encode
+        decode = problem.decode
+        heuristic = problem.heuristic
+        goal_key = encode(problem.get_goal_state())
+        stats = self.stats
+        self.limited = False
+
+        initial_key = encode(problem.get_initial_state())
+        self._write(self._layer_path(0), [initial_key])
+        self.layers.append({"depth": 0, "states": 1, "runs": 0,
+                            "bytes_read": 0, "bytes_written": self.record_size,
+                            "elapsed": 0.0})
+        if initial_key == goal_key:
+            self.goal_depth = 0
+            if stop_at_goal:
+                return 0
+
+        depth = 0
+        while True:
+            layer_start = time.time()
+            self._bytes_read = self._bytes_written = 0
+            runs = []
+            buffer = []
+            found = False
+            for key in self._read(self._layer_path(depth)):
+                if self.expanded >= max_moves or time.time() >= deadline:
+                    self.limited = True
+                    return None
+                self.expanded += 1
+                if stats is not None:
+                    stats.expanded += 1
+                    if depth + 1 > stats.max_depth:
+                        stats.max_depth = depth + 1
+                    if self.report is not None and stats.expanded % self.report_every == 0:
+                        self.report()
+                state = decode(key)
+                for move in problem.get_possible_moves(state):
+                    new_state = problem.apply_move(state, move)
+                    if stats is not None:
+                        stats.generated += 1
+                    if bound is not None:
+                        f = depth + 1 + heuristic(new_state)
+                        if f > bound:
+                            self.next_bound = min(self.next_bound, f)
+                            continue
+                    new_key = encode(new_state)
+                    found = found or new_key == goal_key
+                    buffer.append(new_key)
+                    if len(buffer) >= self.buffer_records:
+                        runs.append(self._flush_run(buffer, depth, len(runs)))
+                        buffer = []
+            if buffer:
+                runs.append(self._flush_run(buffer, depth, len(runs)))
+                buffer = []
+
+            previous = [self._read(self._layer_path(d))
+                        for d in (depth - 1, depth) if d >= 0]
+            merged = heapq.merge(*(self._read(run) for run in runs))
+            states = self._write(self._layer_path(depth + 1),
+                                 _subtract(merged, previous))
+            for run in runs:
+                os.remove(run)
+            depth += 1
+            self.layers.append({"depth": depth, "states": states,
+                                "runs": len(runs),
+                                "bytes_read": self._bytes_read,
+                                "bytes_written": self._bytes_written,
+                                "elapsed": time.time() - layer_start})
+            if stats is not None:
+                stats.open_size = states
+                stats.f_bound = depth if bound is None else bound
+            if found and self.goal_depth is None:
+                self.goal_depth = depth
+                if stop_at_goal:
+                    return depth
+            if states == 0:
+                return self.goal_depth
+
+    def _flush_run(self, buffer, depth, index):
+        path = os.path.join(self.directory, f"run-{depth + 1}-{index}.bin")
+        buffer.sort()
+        self._write(path, buffer)
+        return path
+
+    def path(self):
+        # Walks back from the goal through the layer files, looking each
+        # predecessor up by binary search, and returns the moves
+        problem = self.problem
+        encode = problem.encode
+        size = self.record_size
+        state = problem.get_goal_state()
+        moves = []
+        for depth in range(self.goal_depth - 1, -1, -1):
+            with open(self._layer_path(depth), "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as layer:
+                count = len(layer) // size
+                for predecessor, move in problem.get_predecessor_moves(state):
+                    target = encode(predecessor).to_bytes(size, "big")
+                    low, high = 0, count
+                    while low < high:
+                        middle = (low + high) // 2
+                        if layer[middle * size:(middle + 1) * size] < target:
+                            low = middle + 1
+                        else:
+                            high = middle
+                    if low < count and layer[low * size:(low + 1) * size] == target:
+                        state = predecessor
+                        moves.append(move)
+                        break
+                else:
+                    raise RuntimeError(f"No predecessor found in layer {depth}")
+        moves.reverse()
+        return moves
+
+
+def _subtract(keys, sorted_streams):
+    # Yields the sorted keys that appear in none of the sorted streams
+    heads = [next(stream, None) for stream in sorted_streams]
+    for key in keys:
+        for i, stream in enumerate(sorted_streams):
+            while heads[i] is not None and heads[i] < key:
+                heads[i] = next(stream, None)
+        if all(head != key for head in heads):
+            yield key
@@ -1,12 +1,30 @@
 from base_classes import State, Problem
 import random
+from sliding_block_puzzle import board_is_solvable
+from pattern_database import named_heuristic
 # Updated 9/15/2024
 
 
+def line_conflicts(tiles):
+    # The tiles of one row or column that are in their goal line, in board
+    # order. Every tile that has to leave the line to let the others pass
+    # costs 2 moves on top of the Manhattan distance; the fewest that must
+    # leave is the count minus the longest run already in goal order.
+    # Counting each reversed pair instead overestimates, e.g. 3 2 1.
+    longest = []
+    for i, tile in enumerate(tiles):
+        longest.append(1 + max((longest[j] for j in range(i) if tiles[j] < tile),
+                               default=0))
+    return len(tiles) - max(longest, default=0)
+
+
 class FifteenPuzzleState(State):
-    def __init__(self, board):
+    def __init__(self, board, heuristic=None):
         self.board = board
         self.size = 4
+        # Cached manhattan_distance() + linear_conflicts(); apply_move fills
+        # it in from the parent's value so children never rescan the board
+        self._heuristic = heuristic
 
     def is_valid(self):
         return len(self.board) == self.size * self.size and set(self.board) == set(range(16))
@@ -30,26 +48,12 @@ class FifteenPuzzleState(State):
         index = self.board.index(tile)
         return (index // 4, index % 4)
 
-    def heuristic(self):
-        distance = 0
-        for i in range(16):
-            if i == 0:
-                continue
-            current_row, current_col = self.get_tile_position(i)
-            goal_row, goal_col = divmod(i - 1, 4)
-            distance += abs(current_row - goal_row) + \
-                abs(current_col - goal_col)
-        return distance
-
     def manhattan_distance(self):
         distance = 0
-        for i in range(16):
-            if i == 0:
+        for index, tile in enumerate(self.board):
+            if tile == 0:
                 continue
-            current_row, current_col = self.get_tile_position(i)
-            goal_row, goal_col = divmod(i - 1, 4)
-            distance += abs(current_row - goal_row) + \
-                abs(current_col - goal_col)
+            distance += abs(index // 4 - tile // 4) + abs(index % 4 - tile % 4)
         return distance
 
     def linear_conflicts(self):
@@ -61,47 +65,45 @@ class FifteenPuzzleState(State):
         return conflicts * 2
 
     def _count_conflicts_in_row(self, row):
-        conflicts = 0
-        tiles_in_row = [self.board[row * 4 + i]
-                        for i in range(4) if self.board[row * 4 + i] != 0]
-        for i in range(len(tiles_in_row)):
-            for j in range(i + 1, len(tiles_in_row)):
-                if tiles_in_row[i] > tiles_in_row[j] and (tiles_in_row[i] - 1) // 4 == row and (tiles_in_row[j] - 1) // 4 == row:
-                    conflicts += 1
-        return conflicts
+        return line_conflicts([tile for tile in self.board[row * 4:row * 4 + 4]
+                               if tile != 0 and tile // 4 == row])
 
     def _count_conflicts_in_column(self, col):
-        conflicts = 0
-        tiles_in_col = [self.board[col + 4 * i]
-                        for i in range(4) if self.board[col + 4 * i] != 0]
-        for i in range(len(tiles_in_col)):
-            for j in range(i + 1, len(tiles_in_col)):
-                if tiles_in_col[i] > tiles_in_col[j] and (tiles_in_col[i] - 1) % 4 == col and (tiles_in_col[j] - 1) % 4 == col:
-                    conflicts += 1
-        return conflicts
+        return line_conflicts([tile for tile in self.board[col::4]
+                               if tile != 0 and tile % 4 == col])
 
     def heuristic(self):
-        return self.manhattan_distance() + self.linear_conflicts()
+        if self._heuristic is None:
+            self._heuristic = self.manhattan_distance() + self.linear_conflicts()
+        return self._heuristic
 
 
 class FifteenPuzzleProblem(Problem):
-    def __init__(self):
+    def __init__(self, heuristic=None, seed=None, scramble_moves=10, initial_board=None):
+        # heuristic: optional callable(state) -> int, e.g. a
+        # pattern_database.PatternDatabaseHeuristic(4, 4)
+        self._heuristic = heuristic
+        # A fixed seed always yields the same instance
+        self._random = random.Random(seed)
+        self.scramble_moves = scramble_moves
         self._goal_state = FifteenPuzzleState(list(range(16)))
-        self._initial_state = self._generate_solvable_state()
-        print(f"Initial state:\n{self._initial_state}")
-        print(f"Goal state:\n{self._goal_state}")
+        # initial_board overrides the scramble; see instances.py for
+        # uniformly random boards
+        if initial_board is None:
+            self._initial_state = self._generate_solvable_state()
+        else:
+            self._initial_state = FifteenPuzzleState(list(initial_board))
+            if not self._initial_state.is_valid() or not board_is_solvable(initial_board, 4):
+                raise ValueError("initial_board is not a solvable board")
 
     def _generate_solvable_state(self):
         goal_board = list(range(16))
-        num_moves = 10  # Reduced number of random moves
+        num_moves = self.scramble_moves
         current_state = FifteenPuzzleState(goal_board[:])
-        for i in range(num_moves):
+        for _ in range(num_moves):
             moves = self.get_possible_moves(current_state)
-            move = random.choice(moves)
+            move = self._random.choice(moves)
             current_state = self.apply_move(current_state, move)
-            print(
-                f"Move {i + 1}: {self.get_move_description(move, current_state)}")
-            print(f"State after move:\n{current_state}\n")
         return current_state
 
     def get_initial_state(self):
@@ -126,10 +128,68 @@ class FifteenPuzzleProblem(Problem):
         new_board = state.board[:]
         blank_index = new_board.index(0)
         new_board[blank_index], new_board[move] = new_board[move], new_board[blank_index]
-        return FifteenPuzzleState(new_board)
+        new_state = FifteenPuzzleState(new_board)
+        if self._heuristic is None:
+            new_state._heuristic = self._heuristic_after_move(
+                state, new_state, move, blank_index)
+        return new_state
+
+    def _heuristic_after_move(self, state, new_state, move, blank_index):
+        # Only the moved tile changes its Manhattan distance, by exactly 1.
+        # Linear conflicts can only change in the lines the tile crosses:
+        # its old and new column for a horizontal move, rows for a vertical
+        # one. The order of tiles along the line it slides in is unchanged.
+        tile = state.board[move]
+        goal_row, goal_col = divmod(tile, 4)
+        old_row, old_col = divmod(move, 4)
+        new_row, new_col = divmod(blank_index, 4)
+        delta = abs(new_row - goal_row) + abs(new_col - goal_col) - \
+            abs(old_row - goal_row) - abs(old_col - goal_col)
+        if old_row == new_row:
+            for col in (old_col, new_col):
+                delta += 2 * (new_state._count_conflicts_in_column(col) -
+                              state._count_conflicts_in_column(col))
+        else:
+            for row in (old_row, new_row):
+                delta += 2 * (new_state._count_conflicts_in_row(row) -
+                              state._count_conflicts_in_row(row))
+        return state.heuristic() + delta
+
+    def heuristic_is_admissible(self):
+        # A custom heuristic has to say so itself
+        return self._heuristic is None or getattr(self._heuristic, "admissible", False)
+
+    def encode(self, state):
+        # 4 bits per tile: the low hex digit of each tile's byte
+        return int(bytes(state.board).hex()[1::2], 16)
+
+    def decode(self, key):
+        return FifteenPuzzleState([int(digit, 16) for digit in f"{key:016x}"])
+
+    def key_size(self):
+        return 8
+
+    def tile_layout(self):
+        if self._heuristic is not None:
+            raise NotImplementedError(
+                "Batched search only evaluates the built-in heuristic")
+        return (4, 4, True)
+
+    def invert_move(self, state, move):
+        # Moving the tile back means moving it into the old blank position
+        return state.board.index(0)
 
     def get_move_description(self, move, state):
         return f"Move tile {state.board[move]} to empty space"
 
     def heuristic(self, state):
+        if self._heuristic is not None:
+            return self._heuristic(state)
         return state.heuristic()
+
+
+def make_fifteen_puzzle(seed=None, scramble_moves=10, heuristic="manhattan", board=None):
+    # Registry factory; "manhattan" is the built-in Manhattan distance plus
+    # linear conflicts
+    return FifteenPuzzleProblem(heuristic=named_heuristic(heuristic, 4, 4), seed=seed,
+                                scramble_moves=scramble_moves, initial_board=board)
@@ -1,12 +1,21 @@
 import tkinter as tk
 from tkinter import ttk
+import multiprocessing
+import queue
 import threading
-from solver import InferenceEngine
-from missionaries_cannibals import MCProblem
-from blocks_world import BWProblem, BWState
-from fifteen_puzzle import FifteenPuzzleProblem
-from sliding_block_puzzle import SlidingBlockPuzzleProblem
-from tower_of_hanoi import TowerOfHanoiProblem
+import registry
+from solution_cache import SolutionCache
+from trajectory import Trajectory
+from worker import run_solver
+
+# Moves listed either side of the current step; only these are rendered
+STEP_WINDOW = 10
+PLAY_INTERVAL = 300  # ms between steps in play mode
+POLL_INTERVAL = 100  # ms between checks for solver events
+# Seconds a solver process gets to stop on its own after Cancel
+CANCEL_GRACE = 2.0
+MAX_MOVES = 10000
+TIMEOUT = 120
 
 
 class SolverGUI:
@@ -14,10 +23,11 @@ class SolverGUI:
         self.master = master
         master.title("Problem Solver")
 
-        self.problem_var = tk.StringVar(value="Missionaries and Cannibals")
+        # Built from the registry; problem modules load on first solve
+        titles = [spec.title for spec in registry.PROBLEMS.values()]
+        self.problem_var = tk.StringVar(value=titles[0])
         self.problem_dropdown = ttk.Combobox(master, textvariable=self.problem_var,
-                                             values=["Missionaries and Cannibals", "Blocks World",
-                                                     "15 Puzzle", "Sliding Block Puzzle", "Tower of Hanoi"])
+                                             values=titles, state="readonly")
         self.problem_dropdown.grid(row=0, column=0, padx=5, pady=5)
         self.problem_dropdown.bind(
             "<<ComboboxSelected>>", self.on_problem_select)
@@ -42,16 +52,10 @@ class SolverGUI:
             master, text="Reset", command=self.reset_solution, state=tk.DISABLED)
         self.reset_button.grid(row=1, column=1, padx=5, pady=5)
 
-        self.width_label = tk.Label(master, text="Width:")
-        self.width_entry = tk.Entry(master, width=5)
-        self.width_entry.insert(0, "3")  # Default width
-        self.height_label = tk.Label(master, text="Height:")
-        self.height_entry = tk.Entry(master, width=5)
-        self.height_entry.insert(0, "3")  # Default height
-
-        self.num_disks_label = tk.Label(master, text="Number of Disks:")
-        self.num_disks_entry = tk.Entry(master, width=5)
-        self.num_disks_entry.insert(0, "3")  # Default number of disks
+        # One label and entry per parameter of the selected problem
+        self.params_frame = tk.Frame(master)
+        self.params_frame.grid(row=1, column=2, columnspan=3, sticky='w')
+        self.param_entries = {}
 
         self.output_text = tk.Text(master, wrap=tk.WORD, width=60, height=20)
         self.output_text.grid(row=2, column=0, columnspan=4, padx=5, pady=5)
@@ -66,113 +70,280 @@ class SolverGUI:
         self.progress_bar.grid(
             row=3, column=0, columnspan=4, sticky='ew', padx=5, pady=5)
 
+        self.cancel_button = tk.Button(
+            master, text="Cancel", command=self.cancel_solve, state=tk.DISABLED)
+        self.cancel_button.grid(row=5, column=0, padx=5, pady=5)
+
+        # A separate process keeps the window responsive during heavy
+        # searches, which would otherwise hold the GIL
+        self.use_process_var = tk.BooleanVar(value=False)
+        self.use_process_check = tk.Checkbutton(
+            master, text="Separate process", variable=self.use_process_var)
+        self.use_process_check.grid(row=5, column=1, padx=5, pady=5)
+
+        self.status_var = tk.StringVar(value="")
+        self.status_label = tk.Label(
+            master, textvariable=self.status_var, anchor='w')
+        self.status_label.grid(
+            row=5, column=2, columnspan=2, sticky='ew', padx=5, pady=5)
+
+        self.step_var = tk.IntVar(value=0)
+        self.step_scale = tk.Scale(
+            master, from_=0, to=0, orient=tk.HORIZONTAL, label="Step",
+            variable=self.step_var, command=self.on_step_scale, state=tk.DISABLED)
+        self.step_scale.grid(
+            row=4, column=0, columnspan=3, sticky='ew', padx=5, pady=5)
+
+        self.play_button = tk.Button(
+            master, text="Play", command=self.toggle_play, state=tk.DISABLED)
+        self.play_button.grid(row=4, column=3, padx=5, pady=5)
+
         self.solution = None
+        self.trajectory = None
         self.current_step = 0
         self.problem = None
+        self.header = ""
+        self.playing = False
+        self.play_job = None
+        self.events = None
+        self.cancel_event = None
+        self.worker = None
+        self.poll_job = None
+        # Solving the same instance again is answered from disk
+        self.cache = SolutionCache()
+        self.on_problem_select(None)
 
     def on_problem_select(self, event):
-        problem = self.problem_var.get()
-        self.width_label.grid_remove()
-        self.width_entry.grid_remove()
-        self.height_label.grid_remove()
-        self.height_entry.grid_remove()
-        self.num_disks_label.grid_remove()
-        self.num_disks_entry.grid_remove()
-
-        if problem == "Sliding Block Puzzle":
-            self.width_label.grid(row=1, column=2)
-            self.width_entry.grid(row=1, column=3)
-            self.height_label.grid(row=1, column=4)
-            self.height_entry.grid(row=1, column=5)
-        elif problem == "Tower of Hanoi":
-            self.num_disks_label.grid(row=1, column=2)
-            self.num_disks_entry.grid(row=1, column=3)
+        for widget in self.params_frame.winfo_children():
+            widget.destroy()
+        self.param_entries = {}
+        spec = registry.get(self.problem_var.get())
+        for column, param in enumerate(spec.params):
+            tk.Label(self.params_frame, text=f"{param.label}:").grid(
+                row=0, column=2 * column)
+            if param.kind == "choice":
+                entry = ttk.Combobox(self.params_frame, values=param.choices,
+                                     state="readonly", width=10)
+                entry.set(param.default)
+            else:
+                entry = tk.Entry(self.params_frame,
+                                 width=30 if param.kind == "board" else 5)
+                if param.default is not None:
+                    entry.insert(0, str(param.default))
+            entry.grid(row=0, column=2 * column + 1)
+            self.param_entries[param.name] = entry
 
     def start_solve_thread(self):
-        self.solve_button.config(state=tk.DISABLED)
+        self.stop_play()
+        self.solution = None
+        for widget in (self.step_button, self.reset_button, self.play_button,
+                       self.step_scale):
+            widget.config(state=tk.DISABLED)
         self.output_text.delete(1.0, tk.END)
         self.progress_var.set(0)
-        threading.Thread(target=self.solve_problem, daemon=True).start()
-
-    def solve_problem(self):
-        problem_type = self.problem_var.get()
-        self.output_text.delete(1.0, tk.END)
+        self.status_var.set("")
 
         try:
-            if problem_type == "Missionaries and Cannibals":
-                self.problem = MCProblem()
-            elif problem_type == "Blocks World":
-                initial_state = BWState(
-                    {'A': ['a', 'b', 'c'], 'B': [], 'C': []})
-                goal_state = BWState({'A': ['a'], 'B': ['b'], 'C': ['c']})
-                self.problem = BWProblem(initial_state, goal_state)
-            elif problem_type == "15 Puzzle":
-                self.problem = FifteenPuzzleProblem()
-            elif problem_type == "Sliding Block Puzzle":
-                try:
-                    width = int(self.width_entry.get() or "3")
-                    height = int(self.height_entry.get() or "3")
-                    self.problem = SlidingBlockPuzzleProblem(width, height)
-                except ValueError:
-                    raise ValueError(
-                        "Invalid width or height. Please enter positive integers.")
-            elif problem_type == "Tower of Hanoi":
-                num_disks = int(self.num_disks_entry.get() or "3")
-                self.problem = TowerOfHanoiProblem(num_disks)
-            else:
-                raise ValueError("Invalid problem type selected.")
-
-            engine = InferenceEngine(self.problem)
-            self.solution, moves_explored, time_taken = engine.solve()
-
-            if self.solution:
-                t_out = f"Solution found in {moves_explored} moves and "
-                t_out = t_out + f"{time_taken:.2f} seconds.\n\n"
-                is_out = f"Initial state:\n{self.problem.get_initial_state()}"
-                is_out = is_out + f"\n\n"
-                self.output_text.insert(tk.END, t_out)
-                self.output_text.insert(tk.END, is_out)
-                self.step_button.config(state=tk.NORMAL)
-                self.reset_button.config(state=tk.NORMAL)
-                self.current_step = 0
-            else:
-                self.output_text.insert(
-                    tk.END, "No solution found within the given constraints.")
-
+            spec = registry.get(self.problem_var.get())
+            params = spec.parse({name: entry.get() for name, entry
+                                 in self.param_entries.items()})
         except Exception as e:
             self.output_text.insert(tk.END, f"An error occurred: {str(e)}")
+            return
 
+        self.solve_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        if self.use_process_var.get():
+            context = multiprocessing.get_context()
+            self.events = context.Queue()
+            self.cancel_event = context.Event()
+            self.worker = context.Process(
+                target=run_solver, daemon=True,
+                args=(spec.name, params, self.cache, self.events, self.cancel_event,
+                      spec.algorithm, MAX_MOVES, TIMEOUT))
+        else:
+            self.events = queue.Queue()
+            self.cancel_event = threading.Event()
+            self.worker = threading.Thread(
+                target=run_solver, daemon=True,
+                args=(spec.name, params, self.cache, self.events, self.cancel_event,
+                      spec.algorithm, MAX_MOVES, TIMEOUT))
+        self.worker.start()
+        # Until the first progress report
+        self.status_var.set("Building the problem...")
+        self.poll_job = self.master.after(POLL_INTERVAL, self.poll_events)
+
+    def poll_events(self):
+        # Runs on the Tk thread; the only place solver results reach widgets
+        self.poll_job = None
+        while True:
+            try:
+                kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self.show_progress(payload)
+            elif kind == "done":
+                self.finish_solve(*payload)
+                return
+            else:
+                self.fail_solve(f"An error occurred: {payload}")
+                return
+        if not self.worker.is_alive():
+            # A process can exit before its last event is read; give the
+            # queue a moment before treating the exit as a crash
+            try:
+                kind, payload = self.events.get(timeout=POLL_INTERVAL / 1000)
+            except queue.Empty:
+                self.fail_solve("The solver stopped without a result.")
+                return
+            if kind == "done":
+                self.finish_solve(*payload)
+            elif kind == "error":
+                self.fail_solve(f"An error occurred: {payload}")
+            else:
+                self.poll_job = self.master.after(0, self.poll_events)
+            return
+        self.poll_job = self.master.after(POLL_INTERVAL, self.poll_events)
+
+    def show_progress(self, stats):
+        # The search ends at whichever limit comes first, so the nearer one
+        # drives the bar and the estimate of the time left
+        elapsed = stats["elapsed"]
+        fraction = max(stats["expanded"] / MAX_MOVES, elapsed / TIMEOUT)
+        self.progress_var.set(min(100.0, fraction * 100))
+        remaining = TIMEOUT - elapsed
+        rate = stats["expansions_per_second"]
+        if rate > 0:
+            remaining = min(remaining, (MAX_MOVES - stats["expanded"]) / rate)
+        self.status_var.set(
+            f"{stats['expanded']} nodes, f-bound {stats['f_bound']}, "
+            f"{elapsed:.1f}s elapsed, at most {max(0.0, remaining):.1f}s left")
+
+    def finish_solve(self, problem, solution, moves_explored, time_taken, stats):
+        self.end_solve()
+        self.problem = problem
+        self.solution = solution
+        self.progress_var.set(100)
+        self.status_var.set("")
+        if stats["cancelled"]:
+            self.output_text.insert(
+                tk.END, f"Solve cancelled after {moves_explored} moves.")
+            self.solution = None
+        elif self.solution is not None:
+            if stats["cached"]:
+                self.header = f"Solution loaded from the cache in {time_taken:.2f} seconds.\n\n"
+            else:
+                self.header = f"Solution found in {moves_explored} moves and "
+                self.header = self.header + f"{time_taken:.2f} seconds.\n\n"
+            self.trajectory = Trajectory(self.problem, self.solution)
+            self.step_scale.config(to=self.trajectory.length - 1, state=tk.NORMAL)
+            self.reset_button.config(state=tk.NORMAL)
+            self.play_button.config(state=tk.NORMAL)
+            self.go_to_step(0)
+        else:
+            self.output_text.insert(
+                tk.END, "No solution found within the given constraints.")
+
+    def fail_solve(self, message):
+        self.end_solve()
+        self.status_var.set("")
+        self.output_text.insert(tk.END, message)
+
+    def end_solve(self):
+        if self.poll_job is not None:
+            self.master.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.worker = None
         self.solve_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+
+    def cancel_solve(self):
+        if self.worker is None:
+            return
+        self.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_var.set("Cancelling...")
+        if isinstance(self.worker, multiprocessing.process.BaseProcess):
+            worker = self.worker
+            self.master.after(int(CANCEL_GRACE * 1000),
+                              lambda: self.kill_worker(worker))
+
+    def kill_worker(self, worker):
+        # The search only checks for cancellation between expansions; a
+        # process stuck elsewhere is terminated
+        if worker is self.worker and worker.is_alive():
+            worker.terminate()
+            worker.join()
+            self.fail_solve("Solve cancelled.")
 
     def show_next_step(self):
-        if self.solution and self.current_step < len(self.solution):
-            move = self.solution[self.current_step]
-            current_state = self.problem.get_initial_state()
-            for i in range(self.current_step):
-                current_state = self.problem.apply_move(
-                    current_state, self.solution[i])
-
-            self.output_text.insert(tk.END, f"Step {self.current_step + 1}:\n")
-            self.output_text.insert(
-                tk.END, self.problem.get_move_description(move, current_state) + "\n")
-            new_state = self.problem.apply_move(current_state, move)
-            self.output_text.insert(tk.END, f"After move:\n{new_state}\n\n")
-
-            self.current_step += 1
-
-            if self.current_step == len(self.solution):
-                self.step_button.config(state=tk.DISABLED)
-                self.output_text.insert(tk.END, "Solution complete!\n")
-
-        self.output_text.see(tk.END)
+        if self.solution is not None and self.current_step < self.trajectory.length - 1:
+            self.go_to_step(self.current_step + 1)
+
+    def go_to_step(self, step):
+        self.current_step = max(0, min(step, self.trajectory.length - 1))
+        if self.step_var.get() != self.current_step:
+            self.step_var.set(self.current_step)
+        done = self.current_step == self.trajectory.length - 1
+        self.step_button.config(state=tk.DISABLED if done else tk.NORMAL)
+        if done:
+            self.stop_play()
+        self.render_step()
+
+    def render_step(self):
+        # Redraws only the moves around the current step and its state, so
+        # the cost does not grow with the length of the solution
+        step = self.current_step
+        total = self.trajectory.length - 1
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, self.header)
+        first = max(0, step - STEP_WINDOW)
+        last = min(total, step + STEP_WINDOW)
+        if first > 0:
+            self.output_text.insert(tk.END, "  ...\n")
+        for i in range(first, last):
+            marker = ">" if i == step - 1 else " "
+            description = self.problem.get_move_description(
+                self.solution[i], self.trajectory[i])
+            self.output_text.insert(tk.END, f"{marker} {i + 1}. {description}\n")
+        if last < total:
+            self.output_text.insert(tk.END, "  ...\n")
+        title = "Initial state" if step == 0 else f"After step {step} of {total}"
+        self.output_text.insert(tk.END, f"\n{title}:\n{self.trajectory[step]}\n")
+        if step == total:
+            self.output_text.insert(tk.END, "\nSolution complete!\n")
+
+    def on_step_scale(self, value):
+        if self.solution is not None and int(value) != self.current_step:
+            self.go_to_step(int(value))
+
+    def toggle_play(self):
+        if self.playing:
+            self.stop_play()
+            return
+        if self.current_step == self.trajectory.length - 1:
+            self.go_to_step(0)
+        self.playing = True
+        self.play_button.config(text="Pause")
+        self.play_job = self.master.after(PLAY_INTERVAL, self.play_step)
+
+    def play_step(self):
+        self.play_job = None
+        self.show_next_step()
+        if self.playing:
+            self.play_job = self.master.after(PLAY_INTERVAL, self.play_step)
+
+    def stop_play(self):
+        self.playing = False
+        if self.play_job is not None:
+            self.master.after_cancel(self.play_job)
+            self.play_job = None
+        self.play_button.config(text="Play")
 
     def reset_solution(self):
-        self.current_step = 0
-        self.output_text.delete(1.0, tk.END)
-        is_out = f"Initial state:\n{self.problem.get_initial_state()}"
-        is_out = is_out + f"\n\n"
-        self.output_text.insert(tk.END, is_out)
-        self.step_button.config(state=tk.NORMAL)
+        self.stop_play()
+        self.go_to_step(0)
 
     def clear_output(self):
         self.output_text.delete(1.0, tk.END)
@@ -0,0 +1,96 @@
+import argparse
+import json
+import random
+from fifteen_puzzle import FifteenPuzzleProblem
+from sliding_block_puzzle import (SlidingBlockPuzzleProblem,
+                                  SlidingBlockPuzzleState, board_is_solvable)
+from solver import InferenceEngine
+
+# Uniformly random tile puzzle instances. A shuffled board is solvable half
+# of the time; swapping two tiles (not the blank) flips its parity and maps
+# the unsolvable boards one-to-one onto the solvable ones, so every solvable
+# board is equally likely and no board is ever rejected for parity.
+
+
+def random_board(width, height, rng):
+    board = list(range(width * height))
+    rng.shuffle(board)
+    if not board_is_solvable(board, width):
+        first, second = [i for i, tile in enumerate(board) if tile][:2]
+        board[first], board[second] = board[second], board[first]
+    return board
+
+
+def make_problem(width, height, board, heuristic=None):
+    # The 4x4 board gets FifteenPuzzleProblem for its linear conflicts
+    if (width, height) == (4, 4):
+        return FifteenPuzzleProblem(heuristic=heuristic, initial_board=board)
+    return SlidingBlockPuzzleProblem(width, height, heuristic=heuristic,
+                                     initial_board=board)
+
+
+def generate(width, height, count=1, seed=None, min_heuristic=0, length=None,
+             max_attempts=10000, heuristic=None, **engine_options):
+    # Yields `count` problems, the same ones for the same seed. Boards whose
+    # heuristic is below min_heuristic are redrawn. length=(low, high) keeps
+    # only boards whose optimal solution length is in that band, found with
+    # InferenceEngine(problem, **engine_options); boards the engine gives up
+    # on are redrawn too, which biases the band towards easier boards if the
+    # engine's limits are tight. ValueError after max_attempts draws for one
+    # instance.
+    if width * height < 3:
+        raise ValueError("Boards need at least three cells")
+    rng = random.Random(seed)
+    for _ in range(count):
+        for _ in range(max_attempts):
+            board = random_board(width, height, rng)
+            problem = make_problem(width, height, board, heuristic)
+            estimate = problem.heuristic(problem.get_initial_state())
+            if estimate < min_heuristic:
+                continue
+            if length is not None:
+                low, high = length
+                # Plain Manhattan distance never overestimates, so it rules
+                # out boards that are too far without searching; the
+                # problem's own heuristic need not be admissible
+                if SlidingBlockPuzzleState(board, width, height).heuristic() > high:
+                    continue
+                solution = InferenceEngine(problem, **engine_options).solve()[0]
+                if solution is None or not low <= len(solution) <= high:
+                    continue
+            yield problem
+            break
+        else:
+            raise ValueError(
+                f"No {width}x{height} instance matched after {max_attempts} attempts")
+
+
+def instance_line(problem, heuristic="manhattan"):
+    # A cli.py instance (one JSON line) for a problem from generate()
+    board = problem.get_initial_state().board
+    if isinstance(problem, FifteenPuzzleProblem):
+        name, params = "fifteen", {}
+    else:
+        name, params = "sliding", {"width": problem.width, "height": problem.height}
+    params.update(board=board, heuristic=heuristic)
+    return json.dumps({"problem": name, "params": params})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print random solvable tile "
+                                     "puzzle instances as cli.py instance lines")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--min-heuristic", type=int, default=0)
+    parser.add_argument("--heuristic", choices=("manhattan", "pdb"),
+                        default="manhattan", help="The heuristic to solve them with")
+    args = parser.parse_args(argv)
+    for problem in generate(args.width, args.height, args.count, args.seed,
+                            args.min_heuristic):
+        print(instance_line(problem, args.heuristic))
+
+
+if __name__ == "__main__":
+    main()
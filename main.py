@@ -1,4 +1,4 @@
-from inference_engine import InferenceEngine
+from solver import InferenceEngine
 from missionaries_cannibals import MCProblem
 from blocks_world import BWProblem, BWState
 # Updated 9/15/2024
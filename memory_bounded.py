@@ -0,0 +1,174 @@
+import heapq
+import itertools
+import math
+import sys
+
+# Bookkeeping for SMA* (InferenceEngine algorithm "sma*"). Every byte the
+# search holds is charged against the budget: the nodes with their states
+# and keys, the key -> node table, and both open-list heaps including entries
+# that have gone stale but are not yet popped.
+
+# One heap entry: the 4-tuple itself plus an int counter that is never
+# shared. The pointer slot in the heap list is covered by sizing the list.
+HEAP_ENTRY_BYTES = sys.getsizeof((0, 0, 0, None)) + sys.getsizeof(2 ** 40)
+
+
+def deep_sizeof(obj, seen=None):
+    # Size of obj plus everything it references that is not shared with an
+    # object already counted; small ints and interned strings are counted
+    # too, which errs on the side of over-charging the budget
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SMANode:
+    __slots__ = ("state", "key", "parent", "move", "g", "f", "depth",
+                 "children", "forgotten_f", "in_open", "bytes", "children_bytes")
+
+    def __init__(self, state, key, parent, move, g, f):
+        self.state = state
+        self.key = key
+        self.parent = parent
+        self.move = move
+        self.g = g
+        self.f = f
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.children = []
+        # Lowest f among children pruned from memory; the node must be
+        # expanded again to regenerate them
+        self.forgotten_f = math.inf
+        self.in_open = False
+        self.children_bytes = sys.getsizeof(self.children)
+        self.bytes = sys.getsizeof(self) + deep_sizeof(state) + \
+            sys.getsizeof(key) + self.children_bytes
+
+    def path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node.move)
+            node = node.parent
+        path.reverse()
+        return path
+
+
+class BoundedFrontier:
+    # The nodes held in memory and the open list over them. The open list is
+    # a pair of heaps with lazy deletion: `best` pops the lowest f (deepest,
+    # then newest first) and `worst` the highest f (shallowest, then oldest
+    # first). An entry is live while its node is open with the same f.
+    def __init__(self):
+        self._best = []
+        self._worst = []
+        self._counter = itertools.count()
+        # key -> the node of lowest g in memory for that state
+        self.nodes = {}
+        self.node_count = 0
+        self.open_count = 0
+        self._node_bytes = 0
+
+    @property
+    def bytes_used(self):
+        return (self._node_bytes
+                + (len(self._best) + len(self._worst)) * HEAP_ENTRY_BYTES
+                + sys.getsizeof(self._best) + sys.getsizeof(self._worst)
+                + sys.getsizeof(self.nodes))
+
+    def add(self, node):
+        self._node_bytes += node.bytes
+        self.node_count += 1
+        known = self.nodes.get(node.key)
+        if known is None or node.g < known.g:
+            self.nodes[node.key] = node
+
+    def remove(self, node):
+        if node.in_open:
+            node.in_open = False
+            self.open_count -= 1
+        self._node_bytes -= node.bytes
+        self.node_count -= 1
+        if self.nodes.get(node.key) is node:
+            del self.nodes[node.key]
+
+    def recount(self, node):
+        # Call after node.children has grown or shrunk
+        children_bytes = sys.getsizeof(node.children)
+        delta = children_bytes - node.children_bytes
+        node.children_bytes = children_bytes
+        node.bytes += delta
+        self._node_bytes += delta
+
+    def push(self, node):
+        # Opens the node, or re-files it after its f has changed
+        if not node.in_open:
+            node.in_open = True
+            self.open_count += 1
+        count = next(self._counter)
+        heapq.heappush(self._best, (node.f, -node.depth, -count, node))
+        heapq.heappush(self._worst, (-node.f, node.depth, count, node))
+        if len(self._best) > 2 * self.open_count + 64:
+            self._compact()
+
+    def pop_best(self):
+        while self._best:
+            f, _, _, node = heapq.heappop(self._best)
+            if node.in_open and node.f == f:
+                node.in_open = False
+                self.open_count -= 1
+                return node
+        return None
+
+    def pop_worst_leaf(self, root):
+        # Closes and returns the worst open node with no children in memory,
+        # other than the root; None when there is none
+        skipped = []
+        found = None
+        while self._worst:
+            entry = heapq.heappop(self._worst)
+            node = entry[3]
+            if not node.in_open or node.f != -entry[0]:
+                continue
+            if node.children or node is root:
+                skipped.append(entry)
+                continue
+            node.in_open = False
+            self.open_count -= 1
+            found = node
+            break
+        for entry in skipped:
+            heapq.heappush(self._worst, entry)
+        return found
+
+    def _compact(self):
+        # Rebuilds both heaps with one entry per open node, so stale and
+        # revived duplicate entries stop counting against the budget
+        open_nodes = list(self.nodes_in_open())
+        self._best = []
+        self._worst = []
+        for node in open_nodes:
+            count = next(self._counter)
+            self._best.append((node.f, -node.depth, -count, node))
+            self._worst.append((-node.f, node.depth, count, node))
+        heapq.heapify(self._best)
+        heapq.heapify(self._worst)
+
+    def nodes_in_open(self):
+        seen = set()
+        for entry in self._best:
+            node = entry[3]
+            if node.in_open and node.f == entry[0] and id(node) not in seen:
+                seen.add(id(node))
+                yield node
@@ -1,14 +1,16 @@
 from base_classes import State, Problem
+from array import array
+from collections import deque
 # Updated 9/15/2024
 
 
 class MCState(State):
-    def __init__(self, left_m, left_c, boat_left):
-        self.left_m = max(0, min(3, left_m))
-        self.left_c = max(0, min(3, left_c))
+    def __init__(self, left_m, left_c, boat_left, total_m=3, total_c=3):
+        self.left_m = max(0, min(total_m, left_m))
+        self.left_c = max(0, min(total_c, left_c))
         self.boat_left = boat_left
-        self.right_m = 3 - self.left_m
-        self.right_c = 3 - self.left_c
+        self.right_m = total_m - self.left_m
+        self.right_c = total_c - self.left_c
 
     def is_valid(self):
         if self.left_m < 0 or self.left_c < 0 or self.right_m < 0 or self.right_c < 0:
@@ -38,13 +40,97 @@ class MCState(State):
         left_bank = "M" * self.left_m + "C" * self.left_c
         right_bank = "M" * self.right_m + "C" * self.right_c
         boat = "<" if self.boat_left else ">"
-        return f"({''.join(left_bank):6}){boat}~~~{' ' if self.boat_left else boat}({''.join(right_bank):6})"
+        width = max(6, self.left_m + self.left_c + self.right_m + self.right_c)
+        return f"({''.join(left_bank):{width}}){boat}~~~{' ' if self.boat_left else boat}({''.join(right_bank):{width}})"
 
 
 class MCProblem(Problem):
-    def __init__(self):
-        self._initial_state = MCState(3, 3, True)
-        self._goal_state = MCState(0, 0, False)
+    # N missionaries and M cannibals cross in a boat holding 1 to K people;
+    # cannibals may never outnumber missionaries on a bank that has any.
+    # The valid states and the moves between them are enumerated once into
+    # arrays indexed by encoded state, together with every state's distance
+    # to the goal, so moves, the (exact) heuristic and direct_solution are
+    # table lookups.
+    def __init__(self, num_missionaries=3, num_cannibals=3, boat_capacity=2):
+        self.num_missionaries = num_missionaries
+        self.num_cannibals = num_cannibals
+        self.boat_capacity = boat_capacity
+        self._initial_state = self._state(num_missionaries, num_cannibals, True)
+        self._goal_state = self._state(0, 0, False)
+        self._build_graph()
+
+    def _state(self, left_m, left_c, boat_left):
+        return MCState(left_m, left_c, boat_left,
+                       self.num_missionaries, self.num_cannibals)
+
+    def _valid_cannibals(self, left_m):
+        # Range of left-bank cannibals that is safe on both banks
+        total_m, total_c = self.num_missionaries, self.num_cannibals
+        low = 0 if left_m == total_m else max(0, total_c - total_m + left_m)
+        high = total_c if left_m == 0 else min(total_c, left_m)
+        return low, high
+
+    def _build_graph(self):
+        # Compressed adjacency: the neighbours of key k are
+        # self._targets[self._offsets[k]:self._offsets[k + 1]]
+        total_m, total_c = self.num_missionaries, self.num_cannibals
+        capacity = self.boat_capacity
+        size = (total_m + 1) * (total_c + 1) * 2
+        offsets = array("l", [0]) * (size + 1)
+        targets = array("l")
+        filled = 0
+        # Valid states in increasing key order; the offsets of the invalid
+        # keys in between are filled in bulk, as empty ranges
+        for left_m in range(total_m + 1):
+            low, high = self._valid_cannibals(left_m)
+            for left_c in range(low, high + 1):
+                for boat_left in (False, True):
+                    key = self._pack(left_m, left_c, boat_left)
+                    offsets[filled:key + 1] = array("l", [len(targets)]) * (key + 1 - filled)
+                    filled = key + 1
+                    # The boat takes `sign` people off the left bank per passenger
+                    sign = 1 if boat_left else -1
+                    available_m = left_m if boat_left else total_m - left_m
+                    available_c = left_c if boat_left else total_c - left_c
+                    for m in range(min(capacity, available_m) + 1):
+                        new_m = left_m - sign * m
+                        new_low, new_high = self._valid_cannibals(new_m)
+                        for c in range(0 if m else 1, min(capacity - m, available_c) + 1):
+                            new_c = left_c - sign * c
+                            if new_low <= new_c <= new_high:
+                                targets.append(self._pack(new_m, new_c, not boat_left))
+        offsets[filled:] = array("l", [len(targets)]) * (size + 1 - filled)
+        self._offsets = offsets
+        self._targets = targets
+
+        # Moves are reversible, so a BFS out of the goal gives every state's
+        # distance to it; -1 marks states that cannot reach the goal
+        distance = array("l", [-1]) * size
+        goal = self.encode(self._goal_state)
+        distance[goal] = 0
+        queue = deque([goal])
+        while queue:
+            key = queue.popleft()
+            for target in targets[offsets[key]:offsets[key + 1]]:
+                if distance[target] < 0:
+                    distance[target] = distance[key] + 1
+                    queue.append(target)
+        self._distance = distance
+        # The heuristic of states that cannot reach the goal: more than any
+        # finite distance, yet small enough to keep f values compact
+        self._unreachable = max(distance) + 1
+
+    def _pack(self, left_m, left_c, boat_left):
+        return (left_m * (self.num_cannibals + 1) + left_c) * 2 + int(boat_left)
+
+    def _unpack(self, key):
+        left_m, left_c = divmod(key // 2, self.num_cannibals + 1)
+        return left_m, left_c, bool(key % 2)
+
+    def _move(self, key, target):
+        left_m, left_c, boat_left = self._unpack(key)
+        new_m, new_c, _ = self._unpack(target)
+        return (abs(left_m - new_m), abs(left_c - new_c), boat_left)
 
     def get_initial_state(self):
         return self._initial_state
@@ -53,31 +139,47 @@ class MCProblem(Problem):
         return self._goal_state
 
     def get_possible_moves(self, state):
-        possible_moves = []
-        moves = [(1, 0), (2, 0), (0, 1), (0, 2), (1, 1)]
-
-        for m, c in moves:
-            if state.boat_left:
-                if m <= state.left_m and c <= state.left_c:
-                    new_state = MCState(
-                        state.left_m - m, state.left_c - c, False)
-                    if new_state.is_valid():
-                        possible_moves.append((m, c, True))
-            else:
-                if m <= state.right_m and c <= state.right_c:
-                    new_state = MCState(
-                        state.left_m + m, state.left_c + c, True)
-                    if new_state.is_valid():
-                        possible_moves.append((m, c, False))
-
-        return possible_moves
+        key = self.encode(state)
+        return [self._move(key, target)
+                for target in self._targets[self._offsets[key]:self._offsets[key + 1]]]
 
     def apply_move(self, state, move):
         m, c, from_left = move
         if from_left:
-            return MCState(state.left_m - m, state.left_c - c, False)
+            return self._state(state.left_m - m, state.left_c - c, False)
         else:
-            return MCState(state.left_m + m, state.left_c + c, True)
+            return self._state(state.left_m + m, state.left_c + c, True)
+
+    def encode(self, state):
+        return self._pack(state.left_m, state.left_c, state.boat_left)
+
+    def decode(self, key):
+        return self._state(*self._unpack(key))
+
+    def signature(self):
+        return (self.num_missionaries, self.num_cannibals, self.boat_capacity)
+
+    def key_size(self):
+        return ((len(self._distance) - 1).bit_length() + 7) // 8
+
+    def invert_move(self, state, move):
+        m, c, from_left = move
+        return (m, c, not from_left)
+
+    def direct_solution(self, state):
+        # Follows the distance table down to the goal; None if unreachable
+        distance = self._distance
+        key = self.encode(state)
+        if distance[key] < 0:
+            return None
+        moves = []
+        while distance[key] > 0:
+            for target in self._targets[self._offsets[key]:self._offsets[key + 1]]:
+                if distance[target] == distance[key] - 1:
+                    moves.append(self._move(key, target))
+                    key = target
+                    break
+        return moves
 
     def get_move_description(self, move, state=None):
         m, c, from_left = move
@@ -85,8 +187,12 @@ class MCProblem(Problem):
         return f"{m}M {c}C {direction}"
 
     def heuristic(self, state):
-        # Simple heuristic: number of people on the left bank
-        return state.left_m + state.left_c
+        # Exact distance to the goal
+        distance = self._distance[self.encode(state)]
+        return distance if distance >= 0 else self._unreachable
+
+    def is_dead_end(self, state):
+        return self._distance[self.encode(state)] < 0
 
     def is_mc_problem(self):
         return True
@@ -0,0 +1,74 @@
+import heapq
+import itertools
+
+# Open lists for A*. Both pop the lowest f, then the highest g, then the most
+# recently pushed entry, and never compare the items themselves, so the
+# expansion order is fully determined by the order of pushes.
+
+
+class BucketQueue:
+    # Buckets for non-negative integer f and g: _buckets[f][g] is a LIFO
+    # list. Only the f values in use have buckets, kept in a dict and found
+    # through a heap of them, so memory follows the entries and not the size
+    # of f (an exact heuristic can start at 2^n). Push and pop are O(1)
+    # amortised within an f, O(log k) for a new f among k in use; empty g
+    # buckets are trimmed from the top as pop walks past them.
+    def __init__(self):
+        self._buckets = {}
+        self._f_values = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, f, g, item):
+        by_g = self._buckets.get(f)
+        if by_g is None:
+            by_g = self._buckets[f] = []
+            heapq.heappush(self._f_values, f)
+        while len(by_g) <= g:
+            by_g.append([])
+        by_g[g].append(item)
+        self._size += 1
+
+    def pop(self):
+        if self._size == 0:
+            raise IndexError("pop from an empty BucketQueue")
+        buckets = self._buckets
+        while True:
+            f = self._f_values[0]
+            by_g = buckets[f]
+            while by_g and not by_g[-1]:
+                by_g.pop()
+            if by_g:
+                break
+            heapq.heappop(self._f_values)
+            del buckets[f]
+        self._size -= 1
+        g = len(by_g) - 1
+        return f, g, by_g[g].pop()
+
+
+class HeapQueue:
+    # Same ordering for priorities that are not small integers, e.g. weighted
+    # f-values; the push counter breaks ties instead of the items
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, f, g, item):
+        heapq.heappush(self._heap, (f, -g, -next(self._counter), item))
+
+    def pop(self):
+        f, g, _, item = heapq.heappop(self._heap)
+        return f, -g, item
+
+
+def open_list_for(priority):
+    # Buckets when the priorities are integers, a heap otherwise
+    if isinstance(priority, int) and priority >= 0:
+        return BucketQueue()
+    return HeapQueue()
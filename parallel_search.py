@@ -0,0 +1,187 @@
+import heapq
+import math
+import multiprocessing
+import pickle
+import queue
+import time
+import zlib
+
+# Hash-distributed A* (HDA*): every worker process owns the states whose key
+# hashes to it, with its own open list and parent table. Children are sent
+# to their owner in batches. The coordinator (the calling process) detects
+# termination with Mattern's four-counter method: the search is over once
+# every worker has nothing left below the incumbent cost and two successive
+# reads show the same, equal totals of batches sent and received.
+
+POLL_INTERVAL = 0.05
+
+
+def owner_of(key, num_workers):
+    # hash(int) is the same in every process; anything else is hashed from
+    # its pickle, because str hashing is randomised per process
+    if isinstance(key, int):
+        value = hash(key)
+    else:
+        value = zlib.crc32(pickle.dumps(key))
+    # Packed keys keep the last cells in the low bits, so mix before taking
+    # the modulus to spread neighbouring states across workers
+    return (((value * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % num_workers
+
+
+def _worker(index, num_workers, problem, inboxes, results, incumbent,
+            sent, received, expanded, idle, batch_size):
+    encode = problem.encode
+    goal_state = problem.get_goal_state()
+    inbox = inboxes[index]
+    frontier = []
+    # key -> (parent key, move, g), for the keys this worker owns
+    parents = {}
+    outboxes = [[] for _ in range(num_workers)]
+
+    def insert(key, g, h, parent, move):
+        known = parents.get(key)
+        if known is not None and known[2] <= g:
+            return
+        parents[key] = (parent, move, g)
+        heapq.heappush(frontier, (g + h, g, key))
+
+    def flush(owner):
+        inboxes[owner].put(("nodes", outboxes[owner]))
+        sent[index] += 1
+        outboxes[owner] = []
+
+    while True:
+        has_work = bool(frontier) and frontier[0][0] < incumbent.value
+        if not has_work:
+            for owner in range(num_workers):
+                if outboxes[owner]:
+                    flush(owner)
+            idle[index] = 1
+
+        messages = []
+        try:
+            messages.append(inbox.get_nowait() if has_work
+                            else inbox.get(timeout=POLL_INTERVAL))
+            while True:
+                messages.append(inbox.get_nowait())
+        except queue.Empty:
+            pass
+
+        for message in messages:
+            kind = message[0]
+            if kind == "stop":
+                return
+            if kind == "trace":
+                parent, move, _ = parents[message[1]]
+                results.put(("trace", message[1], parent, move))
+                continue
+            idle[index] = 0
+            for node in message[1]:
+                insert(*node)
+            received[index] += 1
+
+        for _ in range(batch_size):
+            if not frontier or frontier[0][0] >= incumbent.value:
+                break
+            _, g, key = heapq.heappop(frontier)
+            if g > parents[key][2]:
+                continue
+            state = problem.decode(key)
+            if state.is_goal(goal_state):
+                with incumbent.get_lock():
+                    if g < incumbent.value:
+                        incumbent.value = g
+                results.put(("goal", g, key))
+                continue
+
+            expanded[index] += 1
+            for move in problem.get_possible_moves(state):
+                new_state = problem.apply_move(state, move)
+                new_key = encode(new_state)
+                h = problem.heuristic(new_state)
+                if g + 1 + h >= incumbent.value:
+                    continue
+                owner = owner_of(new_key, num_workers)
+                if owner == index:
+                    insert(new_key, g + 1, h, key, move)
+                else:
+                    outboxes[owner].append((new_key, g + 1, h, key, move))
+                    if len(outboxes[owner]) >= batch_size:
+                        flush(owner)
+
+
+def parallel_a_star(problem, workers, max_moves, timeout, batch_size=64,
+                    cancel_event=None):
+    start_time = time.time()
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    incumbent = context.Value("d", math.inf)
+    # The last slot of `sent` counts the coordinator's initial batch
+    sent = context.Array("q", workers + 1, lock=False)
+    received = context.Array("q", workers, lock=False)
+    expanded = context.Array("q", workers, lock=False)
+    idle = context.Array("b", workers, lock=False)
+    processes = [context.Process(
+        target=_worker, daemon=True,
+        args=(i, workers, problem, inboxes, results, incumbent,
+              sent, received, expanded, idle, batch_size))
+        for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    initial_state = problem.get_initial_state()
+    initial_key = problem.encode(initial_state)
+    inboxes[owner_of(initial_key, workers)].put(
+        ("nodes", [(initial_key, 0, problem.heuristic(initial_state), None, None)]))
+    sent[workers] += 1
+
+    goals = {}
+    previous = None
+    try:
+        while True:
+            try:
+                _, cost, key = results.get(timeout=POLL_INTERVAL)
+                goals[cost] = key
+            except queue.Empty:
+                pass
+
+            moves = sum(expanded)
+            if moves >= max_moves or (time.time() - start_time) >= timeout or \
+                    (cancel_event is not None and cancel_event.is_set()):
+                return None, moves, time.time() - start_time
+
+            snapshot = (all(idle), sum(sent), sum(received))
+            if snapshot[0] and snapshot[1] == snapshot[2] and snapshot == previous:
+                break
+            previous = snapshot
+
+        if incumbent.value == math.inf:
+            return None, moves, time.time() - start_time
+        cost = int(incumbent.value)
+        while cost not in goals:
+            _, goal_cost, key = results.get()
+            goals[goal_cost] = key
+
+        # Walk the parent pointers back across the owning workers
+        solution = []
+        key = goals[cost]
+        while True:
+            inboxes[owner_of(key, workers)].put(("trace", key))
+            message = results.get()
+            while message[0] != "trace":
+                message = results.get()
+            _, _, parent, move = message
+            if parent is None:
+                break
+            solution.append(move)
+            key = parent
+        solution.reverse()
+        return solution, moves, time.time() - start_time
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
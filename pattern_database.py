@@ -0,0 +1,209 @@
+import hashlib
+import json
+import mmap
+import os
+from collections import deque
+
+# Goal convention shared with the tile puzzles: the blank is at index 0 and
+# tile t sits at index t.
+DEFAULT_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "pattern_databases")
+UNSEEN = 255
+# Default heuristics by board size, shared by every problem in a process
+_SHARED = {}
+
+
+def default_partition(width, height, max_pattern_size=5):
+    tiles = list(range(1, width * height))
+    return [tuple(tiles[i:i + max_pattern_size])
+            for i in range(0, len(tiles), max_pattern_size)]
+
+
+class PatternDatabase:
+    def __init__(self, width, height, pattern, table):
+        self.width = width
+        self.height = height
+        self.pattern = tuple(pattern)
+        self.table = table
+
+    @staticmethod
+    def size(num_cells, pattern_size):
+        size = 1
+        for i in range(pattern_size):
+            size *= num_cells - i
+        return size
+
+    @staticmethod
+    def rank(positions, num_cells):
+        # Mixed-radix index of an ordered placement of distinct cells
+        index = 0
+        used = 0
+        for i, position in enumerate(positions):
+            smaller = bin(used & ((1 << position) - 1)).count("1")
+            index = index * (num_cells - i) + position - smaller
+            used |= 1 << position
+        return index
+
+    @classmethod
+    def build(cls, width, height, pattern):
+        # Retrograde BFS from the goal over (pattern placement, blank region).
+        # Only moves of pattern tiles are counted, which keeps databases over
+        # disjoint patterns additive. The blank moves freely through the
+        # non-pattern cells, so a state keeps just the connected region that
+        # contains it, named by its lowest cell. Each placement stores its
+        # distance for the closest region, i.e. the minimum over blanks.
+        num_cells = width * height
+        full = (1 << num_cells) - 1
+        not_first_col = not_last_col = 0
+        for cell in range(num_cells):
+            if cell % width != 0:
+                not_first_col |= 1 << cell
+            if cell % width != width - 1:
+                not_last_col |= 1 << cell
+        neighbours = []
+        for cell in range(num_cells):
+            row, col = divmod(cell, width)
+            mask = 0
+            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                if 0 <= row + dr < height and 0 <= col + dc < width:
+                    mask |= 1 << ((row + dr) * width + col + dc)
+            neighbours.append(mask)
+
+        def region(start, free):
+            component = 1 << start
+            while True:
+                grown = component | free & (
+                    ((component << 1) & not_first_col) |
+                    ((component >> 1) & not_last_col) |
+                    (component << width) | (component >> width)) & full
+                if grown == component:
+                    return component
+                component = grown
+
+        table = bytearray([UNSEEN]) * cls.size(num_cells, len(pattern))
+        seen = bytearray(len(table) * num_cells)
+        goal = tuple(pattern)
+        goal_mask = sum(1 << cell for cell in goal)
+        goal_region = region(0, full & ~goal_mask)
+        goal_index = cls.rank(goal, num_cells)
+        seen[goal_index * num_cells + (goal_region & -goal_region).bit_length() - 1] = 1
+        table[goal_index] = 0
+        queue = deque([(goal, goal_region, 0)])
+
+        while queue:
+            positions, blank_region, distance = queue.popleft()
+            occupied = sum(1 << cell for cell in positions)
+            for i, position in enumerate(positions):
+                targets = neighbours[position] & blank_region
+                while targets:
+                    target_bit = targets & -targets
+                    targets ^= target_bit
+                    target = target_bit.bit_length() - 1
+                    new_positions = positions[:i] + (target,) + positions[i + 1:]
+                    new_free = full & ~(occupied ^ (1 << position) ^ target_bit)
+                    new_region = region(position, new_free)
+                    index = cls.rank(new_positions, num_cells)
+                    key = index * num_cells + (new_region & -new_region).bit_length() - 1
+                    if seen[key]:
+                        continue
+                    seen[key] = 1
+                    if table[index] == UNSEEN:
+                        table[index] = distance + 1
+                    queue.append((new_positions, new_region, distance + 1))
+
+        return cls(width, height, pattern, table)
+
+    def lookup(self, positions_by_tile):
+        num_cells = self.width * self.height
+        return self.table[self.rank(
+            [positions_by_tile[tile] for tile in self.pattern], num_cells)]
+
+
+class PatternDatabaseHeuristic:
+    # File layout: one JSON header line, then every table back to back. The
+    # file is memory-mapped read-only so solver processes share one copy.
+    # Each table counts only its own tiles' moves, so the sum is admissible.
+    admissible = True
+
+    def __init__(self, width, height, partition=None, path=None):
+        self.width = width
+        self.height = height
+        self.partition = [tuple(pattern) for pattern in
+                          (partition or default_partition(width, height))]
+        tiles = sorted(tile for pattern in self.partition for tile in pattern)
+        if tiles != list(range(1, width * height)):
+            raise ValueError(
+                "Partition must cover every tile exactly once")
+        if path is None:
+            # The sizes keep names readable; the digest tells apart
+            # partitions that share them
+            name = "-".join(str(len(pattern)) for pattern in self.partition)
+            digest = hashlib.sha1(json.dumps(self.partition).encode("ascii")).hexdigest()[:10]
+            path = os.path.join(
+                DEFAULT_DIRECTORY, f"pdb_{width}x{height}_{name}_{digest}.bin")
+        self.path = path
+        if not os.path.exists(path):
+            self.save(path, [PatternDatabase.build(width, height, pattern)
+                             for pattern in self.partition])
+        self.databases = self.load(path)
+
+    def save(self, path, databases):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        header = {"width": self.width, "height": self.height,
+                  "partition": [list(db.pattern) for db in databases]}
+        # Per process, so builders racing for one path never share a file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(json.dumps(header).encode("ascii") + b"\n")
+            for db in databases:
+                f.write(db.table)
+        os.replace(temporary, path)
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._mmap.find(b"\n")
+        header = json.loads(self._mmap[:header_end])
+        partition = [tuple(pattern) for pattern in header["partition"]]
+        if (header["width"], header["height"], partition) != \
+                (self.width, self.height, self.partition):
+            raise ValueError(f"{path} holds a different pattern database")
+        view = memoryview(self._mmap)
+        offset = header_end + 1
+        databases = []
+        num_cells = self.width * self.height
+        for pattern in partition:
+            size = PatternDatabase.size(num_cells, len(pattern))
+            databases.append(PatternDatabase(
+                self.width, self.height, pattern, view[offset:offset + size]))
+            offset += size
+        return databases
+
+    def __call__(self, state):
+        positions_by_tile = [0] * len(state.board)
+        for index, tile in enumerate(state.board):
+            positions_by_tile[tile] = index
+        return sum(db.lookup(positions_by_tile) for db in self.databases)
+
+    def __getstate__(self):
+        # Worker processes reopen the mapping instead of copying the tables
+        return {"width": self.width, "height": self.height,
+                "partition": self.partition, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def named_heuristic(name, width, height):
+    # The tile puzzles' heuristic argument for a registry name: None for
+    # their built-in one, or the default pattern databases for the size,
+    # opened once per process and built on the first call ever
+    if name == "manhattan":
+        return None
+    if name != "pdb":
+        raise ValueError(f"Unknown heuristic: {name}")
+    if (width, height) not in _SHARED:
+        _SHARED[width, height] = PatternDatabaseHeuristic(width, height)
+    return _SHARED[width, height]
@@ -0,0 +1,182 @@
+import importlib
+
+# Problem registry: each problem is named by "module:callable" and declares
+# its parameters, so front ends can list and build problems without
+# importing any domain module until a problem of that kind is made.
+
+
+class Param:
+    # One integer parameter of a problem factory; optional=True also accepts
+    # "no value" (None), e.g. for a seed
+    kind = "int"
+
+    def __init__(self, name, label, default, minimum=None, maximum=None,
+                 optional=False):
+        self.name = name
+        self.label = label
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.optional = optional
+
+    def parse(self, value):
+        # From a string (an empty one means the default) or a number
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if self.default is None and not self.optional:
+                raise ValueError(f"{self.label} is required")
+            return self.default
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{self.label} must be an integer")
+        if self.minimum is not None and number < self.minimum:
+            raise ValueError(f"{self.label} must be at least {self.minimum}")
+        if self.maximum is not None and number > self.maximum:
+            raise ValueError(f"{self.label} must be at most {self.maximum}")
+        return number
+
+    def as_dict(self):
+        return {"name": self.name, "kind": self.kind, "label": self.label,
+                "default": self.default, "minimum": self.minimum,
+                "maximum": self.maximum, "optional": self.optional}
+
+
+class BoardParam(Param):
+    # A sequence of integers, e.g. a tile board: a list, or a string of
+    # numbers separated by commas or spaces. None when not given. Parsed to
+    # a tuple so parsed parameters stay hashable.
+    kind = "board"
+
+    def __init__(self, name, label):
+        super().__init__(name, label, None, optional=True)
+
+    def parse(self, value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        if isinstance(value, str):
+            value = value.replace(",", " ").split()
+        try:
+            return tuple(int(number) for number in value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{self.label} must be a list of integers")
+
+
+class ChoiceParam(Param):
+    # One of a fixed set of names; the first is the default
+    kind = "choice"
+
+    def __init__(self, name, label, choices):
+        super().__init__(name, label, choices[0])
+        self.choices = tuple(choices)
+
+    def parse(self, value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return self.default
+        if value not in self.choices:
+            raise ValueError(f"{self.label} must be one of {', '.join(self.choices)}")
+        return value
+
+    def as_dict(self):
+        return dict(super().as_dict(), choices=list(self.choices))
+
+
+class ProblemSpec:
+    def __init__(self, name, title, target, params=(), algorithm="astar"):
+        self.name = name
+        self.title = title
+        self.target = target
+        self.params = tuple(params)
+        # The algorithm front ends use unless told otherwise
+        self.algorithm = algorithm
+        self._factory = None
+
+    def load(self):
+        if self._factory is None:
+            module, _, attribute = self.target.partition(":")
+            self._factory = getattr(importlib.import_module(module), attribute)
+        return self._factory
+
+    def parse(self, values):
+        # Validated keyword arguments for the factory; unknown names are errors
+        unknown = set(values) - {param.name for param in self.params}
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: "
+                             f"{', '.join(sorted(unknown))}")
+        return {param.name: param.parse(values.get(param.name))
+                for param in self.params}
+
+    def make(self, **values):
+        return self.load()(**self.parse(values))
+
+    def is_random(self, params):
+        # Whether parsed parameters leave the instance to chance: a seed
+        # parameter without a value and no board to start from
+        return params.get("seed", 0) is None and params.get("board") is None
+
+    def as_dict(self):
+        return {"name": self.name, "title": self.title,
+                "algorithm": self.algorithm,
+                "params": [param.as_dict() for param in self.params]}
+
+
+PROBLEMS = {}
+
+
+def register(spec):
+    PROBLEMS[spec.name] = spec
+    return spec
+
+
+def get(name):
+    # By name or by title
+    spec = PROBLEMS.get(name)
+    if spec is None:
+        for candidate in PROBLEMS.values():
+            if candidate.title == name:
+                return candidate
+        raise ValueError(f"Unknown problem: {name}")
+    return spec
+
+
+def make_problem(name, **values):
+    return get(name).make(**values)
+
+
+def _seed():
+    return Param("seed", "Seed", None, optional=True)
+
+
+def _tile_params():
+    # "pdb" opens the default pattern databases for the board size, built
+    # the first time a problem asks for them
+    return [ChoiceParam("heuristic", "Heuristic", ("manhattan", "pdb")),
+            BoardParam("board", "Board")]
+
+
+register(ProblemSpec(
+    "missionaries", "Missionaries and Cannibals",
+    "missionaries_cannibals:MCProblem",
+    [Param("num_missionaries", "Missionaries", 3, minimum=0),
+     Param("num_cannibals", "Cannibals", 3, minimum=0),
+     Param("boat_capacity", "Boat capacity", 2, minimum=1)]))
+register(ProblemSpec(
+    "blocks", "Blocks World", "blocks_world:make_blocks_world",
+    [Param("num_blocks", "Blocks", 3, minimum=1),
+     Param("num_pegs", "Pegs", 3, minimum=1),
+     _seed()]))
+register(ProblemSpec(
+    "fifteen", "15 Puzzle", "fifteen_puzzle:make_fifteen_puzzle",
+    [_seed(), Param("scramble_moves", "Scramble moves", 10, minimum=0),
+     *_tile_params()]))
+register(ProblemSpec(
+    "sliding", "Sliding Block Puzzle", "sliding_block_puzzle:make_sliding_block_puzzle",
+    [Param("width", "Width", 3, minimum=1), Param("height", "Height", 3, minimum=1),
+     _seed(), Param("scramble_moves", "Scramble moves", 20, minimum=0),
+     *_tile_params()]))
+# Hanoi's moves are known in closed form and streamed, however many disks
+# there are
+register(ProblemSpec(
+    "hanoi", "Tower of Hanoi", "tower_of_hanoi:TowerOfHanoiProblem",
+    [Param("num_disks", "Disks", 3, minimum=0),
+     Param("num_pegs", "Pegs", 3, minimum=3)],
+    algorithm="direct"))
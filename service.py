@@ -0,0 +1,571 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import http.client
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+import registry
+from cli import MOVE_LIMIT, result
+from solver import InferenceEngine
+
+# Local HTTP/JSON solve service. Requests wait in a bounded queue (429 when
+# it is full) and are handed to a pool of worker processes started up front;
+# each worker keeps the problems it has built, so tables such as the
+# Missionaries and Cannibals graph are built once per worker, not per solve.
+#
+#   POST   /solve        {"problem", "params", "algorithm", "deadline",
+#                         "max_moves", "moves", "move_limit", "id"}
+#                         -> result record
+#   DELETE /solve/<id>   cancel a queued or running solve
+#   GET    /problems, /metrics, /health
+#
+# "deadline" is in seconds from arrival and covers the time spent queued. A
+# solve that overruns it is asked to stop through its worker's cancel event
+# and the worker is replaced if it has not answered KILL_GRACE later. A
+# client that disconnects cancels its solve the same way. Overrunning the
+# deadline is an outcome, not an HTTP error: whether it expires in the
+# queue, the engine stops at it, or the worker is killed, the answer is a
+# 200 with "status": "timeout". Likewise for "cancelled".
+#
+# HTTP errors are for solves the service could not run: 400, 429, 503 when
+# a worker is gone or the service is shutting down, and 500 when a worker
+# dies during a solve. Dead workers are replaced and /health says
+# "degraded" while fewer are alive than configured.
+#
+# --warm entries are "name" or "name:param=value,..." and are built in
+# every worker at start, e.g. "fifteen:heuristic=pdb" for the pattern
+# databases. They are built once in the server first, so files they create
+# are written by one process only. A request for pattern databases that
+# are not warm has the server build them the same way, once, before it is
+# queued; its deadline runs meanwhile.
+#
+# Records list at most "move_limit" moves (no more than --move-limit) and
+# say "moves_truncated" when there were more, as in cli.py.
+
+KILL_GRACE = 1.0
+# The engine stops itself at the deadline; it is only cancelled from here if
+# it has not answered this long after
+DEADLINE_SLACK = 0.25
+READ_TIMEOUT = 10.0
+MAX_BODY = 1 << 20
+# Recent requests kept for the latency percentiles in /metrics
+LATENCY_WINDOW = 1000
+# Problems each worker keeps built, least recently used dropped first
+PROBLEM_CACHE = 32
+# The parameters that pick a problem's shared tables, e.g. the pattern
+# databases for a heuristic and board size
+TABLE_PARAMS = ("width", "height", "heuristic")
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large",
+           429: "Too Many Requests", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+def parse_warm(entry):
+    # "fifteen:heuristic=pdb,seed=3" -> ("fifteen", {"heuristic": "pdb", "seed": "3"})
+    name, _, rest = entry.partition(":")
+    try:
+        params = dict(item.split("=", 1) for item in rest.split(",") if item)
+    except ValueError:
+        raise ValueError(f"Bad warm entry: {entry}")
+    spec = registry.get(name)
+    spec.parse(params)
+    return spec.name, params
+
+
+def _worker(connection, cancel_event, warm):
+    problems = collections.OrderedDict()
+
+    def build(name, params):
+        spec = registry.get(name)
+        params = spec.parse(params)
+        key = (spec.name, tuple(sorted(params.items())))
+        problem = problems.get(key)
+        if problem is None:
+            problem = spec.load()(**params)
+            # Random problems are different every time, so only repeatable
+            # ones are kept
+            if not spec.is_random(params):
+                problems[key] = problem
+                while len(problems) > PROBLEM_CACHE:
+                    problems.popitem(last=False)
+        else:
+            problems.move_to_end(key)
+        return spec, problem
+
+    for name, params in warm:
+        build(name, params)
+    connection.send("ready")
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        try:
+            spec, problem = build(job["problem"], job["params"])
+            engine = InferenceEngine(
+                problem, algorithm=job["algorithm"] or spec.algorithm,
+                timeout=job["timeout"], max_moves=job["max_moves"],
+                cancel_event=cancel_event)
+            solution, _, _ = engine.solve()
+            record = result(engine, solution, job["moves"], job["move_limit"])
+        except Exception as e:
+            record = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        connection.send(record)
+
+
+class Worker:
+    def __init__(self, context, warm):
+        self.cancel_event = context.Event()
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker, daemon=True,
+            args=(child_connection, self.cancel_event, warm))
+        self.process.start()
+        child_connection.close()
+
+    def stop(self, timeout=1.0):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+
+class Job:
+    def __init__(self, job_id, request, deadline):
+        self.id = job_id
+        self.request = request
+        self.deadline = deadline
+        self.created = time.monotonic()
+        self.started = None
+        # Set by DELETE or a disconnect; the dispatcher stops the solve
+        self.cancelled = asyncio.Event()
+        # Resolves to (HTTP status, payload)
+        self.future = asyncio.get_running_loop().create_future()
+
+
+def summary(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {"count": len(ordered), "mean": sum(ordered) / len(ordered),
+            "p50": percentile(0.5), "p90": percentile(0.9),
+            "p99": percentile(0.99), "max": ordered[-1]}
+
+
+class SolveService:
+    def __init__(self, host="127.0.0.1", port=0, workers=None, queue_size=64,
+                 max_deadline=120.0, max_moves=1000000, warm=(),
+                 move_limit=MOVE_LIMIT):
+        self.host = host
+        self.port = port
+        self.num_workers = workers or multiprocessing.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_deadline = max_deadline
+        self.max_moves = max_moves
+        self.move_limit = move_limit
+        # (name, params) each worker builds at start
+        self.warm = tuple(parse_warm(entry) for entry in warm)
+        self.workers = []
+        self.jobs = {}
+        self.responses = collections.Counter()
+        self.outcomes = collections.Counter()
+        self.restarts = 0
+        self.in_flight = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits = collections.deque(maxlen=LATENCY_WINDOW)
+        self.solve_times = collections.deque(maxlen=LATENCY_WINDOW)
+        self._ids = itertools.count(1)
+        # Table key -> future of the server building those tables
+        self._tables = {}
+        self._context = multiprocessing.get_context()
+        self._queue = None
+        self._server = None
+        self._dispatchers = []
+        self._executor = None
+        self._started = None
+
+    async def start(self):
+        # Returns once every worker is warm and the port is bound
+        loop = asyncio.get_running_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.num_workers)
+        self._queue = asyncio.Queue(self.queue_size)
+        for name, params in self.warm:
+            await loop.run_in_executor(
+                self._executor, functools.partial(registry.make_problem, name, **params))
+        self.workers = [Worker(self._context, self.warm) for _ in range(self.num_workers)]
+        for worker in self.workers:
+            await loop.run_in_executor(self._executor, worker.connection.recv)
+        self._dispatchers = [asyncio.ensure_future(self._dispatch(index))
+                             for index in range(self.num_workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started = time.monotonic()
+
+    async def close(self):
+        self._server.close()
+        for dispatcher in self._dispatchers:
+            dispatcher.cancel()
+        # Answer whoever is still waiting before waiting for their connections
+        for job in list(self.jobs.values()):
+            if not job.future.done():
+                job.future.set_result((503, {"id": job.id, "error": "Shutting down"}))
+        await self._server.wait_closed()
+        loop = asyncio.get_running_loop()
+        for worker in self.workers:
+            worker.cancel_event.set()
+            await loop.run_in_executor(self._executor, worker.stop)
+        self._executor.shutdown()
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def _dispatch(self, index):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.future.done():
+                # Cancelled or abandoned while queued
+                continue
+            remaining = job.deadline - time.monotonic()
+            if remaining <= 0:
+                self.outcomes["timeout"] += 1
+                job.future.set_result((200, {"id": job.id, "status": "timeout",
+                                             "error": "Deadline passed while queued"}))
+                continue
+            worker = self.workers[index]
+            job.started = time.monotonic()
+            self.queue_waits.append(job.started - job.created)
+            self.in_flight += 1
+            worker.cancel_event.clear()
+            try:
+                worker.connection.send(dict(job.request, timeout=remaining))
+            except (EOFError, OSError):
+                # The worker was already gone; the solve never started
+                await self._replace(index)
+                status, record = 503, {"status": "error",
+                                       "error": "No worker was available; it has been replaced"}
+            else:
+                status, record = await self._receive(index, job, remaining)
+            self.in_flight -= 1
+            self.solve_times.append(time.monotonic() - job.started)
+            self.outcomes[record["status"]] += 1
+            if not job.future.done():
+                job.future.set_result((status, dict(record, id=job.id)))
+
+    async def _receive(self, index, job, remaining):
+        # (HTTP status, record) for a solve the worker at index was sent
+        loop = asyncio.get_running_loop()
+        worker = self.workers[index]
+        receive = loop.run_in_executor(self._executor, worker.connection.recv)
+        cancelled = asyncio.ensure_future(job.cancelled.wait())
+        done, _ = await asyncio.wait({receive, cancelled},
+                                     timeout=remaining + DEADLINE_SLACK,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        cancelled.cancel()
+        if receive not in done:
+            # The engine checks the event every report_every expansions
+            worker.cancel_event.set()
+            done, _ = await asyncio.wait({receive}, timeout=KILL_GRACE)
+        if receive in done:
+            try:
+                return 200, receive.result()
+            except (EOFError, OSError):
+                # The worker died mid-solve, e.g. killed for memory
+                await self._replace(index)
+                return 500, {"status": "error",
+                             "error": "The worker exited during the solve; it has been replaced"}
+        worker.process.terminate()
+        # The pending recv ends with EOFError once the child is gone
+        await asyncio.wait({receive})
+        receive.exception()
+        await self._replace(index)
+        return 200, {"status": "cancelled" if job.cancelled.is_set() else "timeout",
+                     "error": "The solve did not stop and its worker was replaced"}
+
+    async def _replace(self, index):
+        # Swaps in a fresh, warm worker. If that one fails to start too, the
+        # next solve sent to it finds out and replaces it again.
+        loop = asyncio.get_running_loop()
+        worker = self.workers[index]
+        self.restarts += 1
+        worker.process.terminate()
+        worker.process.join()
+        worker.connection.close()
+        self.workers[index] = worker = Worker(self._context, self.warm)
+        try:
+            await loop.run_in_executor(self._executor, worker.connection.recv)
+        except (EOFError, OSError):
+            pass
+
+    async def _handle(self, reader, writer):
+        start = time.monotonic()
+        method = path = ""
+        try:
+            method, path, body = await asyncio.wait_for(
+                self._read_request(reader), READ_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            return
+        except ValueError as e:
+            response = (413 if str(e) == "Body too large" else 400, {"error": str(e)}, {})
+        else:
+            response = await self._route(method, path, body, reader)
+        if response is not None:
+            status, payload, headers = response
+            self.responses[status] += 1
+            if path_kind(path) == "solve" and method == "POST":
+                self.latencies.append(time.monotonic() - start)
+            data = json.dumps(payload).encode()
+            head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(data)}", "Connection: close"]
+            head.extend(f"{name}: {value}" for name, value in headers.items())
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("closed before the request line")
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise ValueError("Malformed request line")
+        method, path, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ValueError("Bad Content-Length")
+        if length > MAX_BODY:
+            raise ValueError("Body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body
+
+    async def _route(self, method, path, body, reader):
+        kind = path_kind(path)
+        if method == "GET" and kind == "health":
+            alive = sum(worker.process.is_alive() for worker in self.workers)
+            return 200, {"status": "ok" if alive >= self.num_workers else "degraded",
+                         "workers": alive, "configured": self.num_workers}, {}
+        if method == "GET" and kind == "metrics":
+            return 200, self.metrics(), {}
+        if method == "GET" and kind == "problems":
+            return 200, [spec.as_dict() for spec in registry.PROBLEMS.values()], {}
+        if method == "POST" and path == "/solve":
+            return await self._solve(body, reader)
+        if method == "DELETE" and kind == "solve":
+            return self._cancel(path[len("/solve/"):])
+        if kind in ("health", "metrics", "problems", "solve"):
+            return 405, {"error": f"{method} not allowed on {path}"}, {}
+        return 404, {"error": f"No such path: {path}"}, {}
+
+    def _parse(self, body):
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise ValueError("Body is not JSON")
+        if not isinstance(request, dict) or "problem" not in request:
+            raise ValueError('Expected a JSON object with "problem"')
+        spec = registry.get(request["problem"])
+        params = request.get("params", {})
+        if not isinstance(params, dict):
+            raise ValueError('"params" must be an object')
+        parsed = spec.parse(params)
+        algorithm = request.get("algorithm")
+        if algorithm is not None and algorithm not in InferenceEngine.ALGORITHMS:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        # Workers are daemonic and cannot start the processes these need
+        if (algorithm or spec.algorithm) in InferenceEngine.MULTIPROCESS:
+            raise ValueError(f"Algorithm {algorithm or spec.algorithm} "
+                             "is not available in the service")
+        deadline = float(request.get("deadline", self.max_deadline))
+        max_moves = int(request.get("max_moves", self.max_moves))
+        if deadline <= 0 or max_moves <= 0:
+            raise ValueError('"deadline" and "max_moves" must be positive')
+        move_limit = int(request.get("move_limit", self.move_limit))
+        if move_limit < 0:
+            raise ValueError('"move_limit" must not be negative')
+        job_id = str(request.get("id", next(self._ids)))
+        if job_id in self.jobs:
+            raise ValueError(f"A solve with id {job_id} is already running")
+        tables = None
+        if parsed.get("heuristic") == "pdb":
+            tables = (spec.name, tuple((name, parsed[name]) for name in TABLE_PARAMS
+                                       if name in parsed))
+        return job_id, min(deadline, self.max_deadline), tables, {
+            "problem": spec.name, "params": params, "algorithm": algorithm,
+            "max_moves": min(max_moves, self.max_moves),
+            "moves": bool(request.get("moves", True)),
+            "move_limit": min(move_limit, self.move_limit)}
+
+    def _build_tables(self, key):
+        # Builds the problem with only its table parameters set, once per
+        # key, on the default executor so the worker pipes are not held up.
+        # A failed build is tried again by the next request.
+        future = self._tables.get(key)
+        if future is None:
+            name, params = key
+            future = asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(registry.make_problem, name, **dict(params)))
+            future.add_done_callback(
+                lambda done: done.exception() and self._tables.pop(key, None))
+            self._tables[key] = future
+        return future
+
+    async def _solve(self, body, reader):
+        arrival = time.monotonic()
+        try:
+            job_id, deadline, tables, request = self._parse(body)
+        except (TypeError, ValueError) as e:
+            return 400, {"error": str(e)}, {}
+        if tables is not None:
+            built = self._build_tables(tables)
+            done, _ = await asyncio.wait({built}, timeout=deadline)
+            if not done:
+                self.outcomes["timeout"] += 1
+                return 200, {"id": job_id, "status": "timeout",
+                             "error": "Deadline passed while its tables were built"}, {}
+            if built.exception() is not None:
+                error = built.exception()
+                self.outcomes["error"] += 1
+                return 500, {"id": job_id, "status": "error",
+                             "error": f"{type(error).__name__}: {error}"}, {}
+        job = Job(job_id, request, arrival + deadline)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return 429, {"error": "Queue full"}, {"Retry-After": "1"}
+        self.jobs[job_id] = job
+        # Reading past the request only returns once the client hangs up
+        hangup = asyncio.ensure_future(reader.read(1))
+        try:
+            done, _ = await asyncio.wait({job.future, hangup},
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if job.future not in done and (
+                    hangup.exception() is not None or hangup.result() == b""):
+                self._cancel(job_id)
+                return None
+            status, payload = await job.future
+            return status, payload, {}
+        finally:
+            hangup.cancel()
+            del self.jobs[job_id]
+
+    def _cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.future.done():
+            return 404, {"error": f"No solve with id {job_id}"}, {}
+        if job.started is None:
+            self.outcomes["cancelled"] += 1
+            job.future.set_result((200, {"id": job_id, "status": "cancelled"}))
+        job.cancelled.set()
+        return 200, {"id": job_id, "cancelled": True}, {}
+
+    def metrics(self):
+        return {
+            "uptime": time.monotonic() - self._started,
+            "workers": len(self.workers),
+            "worker_restarts": self.restarts,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "responses": {str(status): count for status, count in sorted(self.responses.items())},
+            "outcomes": dict(self.outcomes),
+            "latency": summary(self.latencies),
+            "queue_wait": summary(self.queue_waits),
+            "solve_time": summary(self.solve_times),
+        }
+
+
+def path_kind(path):
+    # "/solve/7" -> "solve"
+    return path.strip("/").split("/")[0]
+
+
+def call(method, path, body=None, host="127.0.0.1", port=8765, timeout=None):
+    # Minimal client for other tools: returns (HTTP status, decoded JSON)
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        data = None if body is None else json.dumps(body).encode()
+        connection.request(method, path, body=data,
+                           headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+
+async def serve(options):
+    service = SolveService(**options)
+    await service.start()
+    print(f"Listening on http://{service.host}:{service.port}", file=sys.stderr, flush=True)
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def _warm_entry(entry):
+    try:
+        parse_warm(entry)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local solve service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="Requests waiting for a worker before 429s")
+    parser.add_argument("--max-deadline", type=float, default=120.0)
+    parser.add_argument("--max-moves", type=int, default=1000000)
+    parser.add_argument("--move-limit", type=int, default=MOVE_LIMIT,
+                        help="Most moves listed in a response")
+    parser.add_argument("--warm", action="append", default=[],
+                        metavar="PROBLEM[:PARAM=VALUE,...]", type=_warm_entry,
+                        help="Build this problem in every worker at start, "
+                        "e.g. fifteen:heuristic=pdb")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve({"host": args.host, "port": args.port,
+                           "workers": args.workers, "queue_size": args.queue_size,
+                           "max_deadline": args.max_deadline,
+                           "max_moves": args.max_moves, "warm": args.warm,
+                           "move_limit": args.move_limit}))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,34 @@
 from base_classes import State, Problem
 import random
+from pattern_database import named_heuristic
 # Update 9/15/2024
 
 
+def board_is_solvable(board, width):
+    # With the blank's goal at index 0, every move swaps the blank with a
+    # neighbour: one transposition and one step of the blank's row + column.
+    # So a board is reachable exactly when the parity of its permutation
+    # equals the parity of that distance. Parity from the cycle count, O(n).
+    seen = [False] * len(board)
+    cycles = 0
+    for start in range(len(board)):
+        if not seen[start]:
+            cycles += 1
+            index = start
+            while not seen[index]:
+                seen[index] = True
+                index = board[index]
+    row, col = divmod(board.index(0), width)
+    return (len(board) - cycles) % 2 == (row + col) % 2
+
+
 class SlidingBlockPuzzleState(State):
-    def __init__(self, board, width, height):
+    def __init__(self, board, width, height, heuristic=None):
         self.board = board
         self.width = width
         self.height = height
+        # Cached Manhattan distance; apply_move fills it in from the parent
+        self._heuristic = heuristic
 
     def is_valid(self):
         return len(self.board) == self.width * self.height and set(self.board) == set(range(self.width * self.height))
@@ -32,49 +53,55 @@ class SlidingBlockPuzzleState(State):
         return (index // self.width, index % self.width)
 
     def heuristic(self):
-        distance = 0
-        for i in range(self.width * self.height):
-            if i == 0:
-                continue
-            current_row, current_col = self.get_tile_position(i)
-            goal_row, goal_col = divmod(i - 1, self.width)
-            distance += abs(current_row - goal_row) + \
-                abs(current_col - goal_col)
-        return distance
+        if self._heuristic is None:
+            width = self.width
+            distance = 0
+            for index, tile in enumerate(self.board):
+                if tile == 0:
+                    continue
+                distance += abs(index // width - tile // width) + \
+                    abs(index % width - tile % width)
+            self._heuristic = distance
+        return self._heuristic
 
 
 class SlidingBlockPuzzleProblem(Problem):
-    def __init__(self, width, height):
+    def __init__(self, width, height, heuristic=None, seed=None, scramble_moves=20,
+                 initial_board=None):
         self.width = width
         self.height = height
+        # heuristic: optional callable(state) -> int, e.g. a
+        # pattern_database.PatternDatabaseHeuristic(width, height)
+        self._heuristic = heuristic
+        # A fixed seed always yields the same instance
+        self._random = random.Random(seed)
+        self.scramble_moves = scramble_moves
+        self._hex_digits = 1 if width * height <= 16 else 2
         self._goal_state = SlidingBlockPuzzleState(
             list(range(width * height)), width, height)
-        self._initial_state = self._generate_solvable_state()
-        print(f"Initial state:\n{self._initial_state}")
-        print(f"Goal state:\n{self._goal_state}")
+        # initial_board overrides the scramble; see instances.py for
+        # uniformly random boards
+        if initial_board is None:
+            self._initial_state = self._generate_solvable_state()
+        else:
+            self._initial_state = SlidingBlockPuzzleState(
+                list(initial_board), width, height)
+            if not self._initial_state.is_valid() or not self._is_solvable(initial_board):
+                raise ValueError("initial_board is not a solvable board")
 
     def _generate_solvable_state(self):
         goal_board = list(range(self.width * self.height))
-        num_moves = 20  # Reduced number of random moves
+        num_moves = self.scramble_moves
         current_state = SlidingBlockPuzzleState(
             goal_board[:], self.width, self.height)
-        for i in range(num_moves):
+        for _ in range(num_moves):
             moves = self.get_possible_moves(current_state)
-            move = random.choice(moves)
+            move = self._random.choice(moves)
             current_state = self.apply_move(current_state, move)
-            print(
-                f"Move {i + 1}: {self.get_move_description(move, current_state)}")
-            print(f"State after move:\n{current_state}\n")
         return current_state
 
     def _is_solvable(self, board):
-        inversions = sum(1 for i in range(len(board)) for j in range(
-            i + 1, len(board)) if board[i] and board[j] and board[i] > board[j])
-        blank_row = board.index(0) // self.width
-        if self.width % 2 == 1:
-            return inversions % 2 == 0
-        else:
-            return (inversions % 2 == 0) == (blank_row % 2 == 1)
+        return board_is_solvable(board, self.width)
 
     def get_initial_state(self):
         return self._initial_state
@@ -98,10 +125,63 @@ class SlidingBlockPuzzleProblem(Problem):
         new_board = state.board[:]
         blank_index = new_board.index(0)
         new_board[blank_index], new_board[move] = new_board[move], new_board[blank_index]
-        return SlidingBlockPuzzleState(new_board, self.width, self.height)
+        new_state = SlidingBlockPuzzleState(new_board, self.width, self.height)
+        if self._heuristic is None:
+            # Only the moved tile's Manhattan distance changes, by exactly 1
+            tile = state.board[move]
+            goal = tile // self.width, tile % self.width
+            old = move // self.width, move % self.width
+            new = blank_index // self.width, blank_index % self.width
+            new_state._heuristic = state.heuristic() + \
+                abs(new[0] - goal[0]) + abs(new[1] - goal[1]) - \
+                abs(old[0] - goal[0]) - abs(old[1] - goal[1])
+        return new_state
+
+    def heuristic_is_admissible(self):
+        # A custom heuristic has to say so itself
+        return self._heuristic is None or getattr(self._heuristic, "admissible", False)
+
+    def encode(self, state):
+        # 4 bits per tile up to 16 cells, a full byte per tile beyond that
+        digits = bytes(state.board).hex()
+        return int(digits[1::2] if self._hex_digits == 1 else digits, 16)
+
+    def decode(self, key):
+        width = self._hex_digits
+        digits = f"{key:0{self.width * self.height * width}x}"
+        board = [int(digits[i:i + width], 16)
+                 for i in range(0, len(digits), width)]
+        return SlidingBlockPuzzleState(board, self.width, self.height)
+
+    def signature(self):
+        return (self.width, self.height)
+
+    def key_size(self):
+        return (self.width * self.height * self._hex_digits + 1) // 2
+
+    def tile_layout(self):
+        if self._heuristic is not None:
+            raise NotImplementedError(
+                "Batched search only evaluates the built-in heuristic")
+        return (self.width, self.height, False)
+
+    def invert_move(self, state, move):
+        # Moving the tile back means moving it into the old blank position
+        return state.board.index(0)
 
     def get_move_description(self, move, state):
         return f"Move tile {state.board[move]} to empty space"
 
     def heuristic(self, state):
+        if self._heuristic is not None:
+            return self._heuristic(state)
         return state.heuristic()
+
+
+def make_sliding_block_puzzle(width=3, height=3, seed=None, scramble_moves=20,
+                              heuristic="manhattan", board=None):
+    # Registry factory
+    return SlidingBlockPuzzleProblem(width, height,
+                                     heuristic=named_heuristic(heuristic, width, height),
+                                     seed=seed, scramble_moves=scramble_moves,
+                                     initial_board=board)
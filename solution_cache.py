@@ -0,0 +1,173 @@
+import ast
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Solutions keyed by problem type, goal and start state. Each stored path
+# also indexes every state along it, because the rest of an optimal path
+# from any of its states is an optimal path from that state: a solve that
+# starts anywhere on a stored path is answered with its suffix. Moves are
+# stored as their repr and read back with ast.literal_eval, so they must be
+# built from literals (ints, strings, tuples, ...).
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "solution_cache.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    id INTEGER PRIMARY KEY,
+    moves TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS states (
+    problem TEXT NOT NULL,
+    goal TEXT NOT NULL,
+    state TEXT NOT NULL,
+    solution INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (problem, goal, state)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS states_by_solution ON states (solution);
+CREATE INDEX IF NOT EXISTS solutions_by_use ON solutions (last_used);
+"""
+
+
+def problem_key(problem):
+    # Problem type plus the parameters its encoded keys depend on
+    cls = type(problem)
+    return f"{cls.__module__}.{cls.__qualname__}{problem.signature()!r}"
+
+
+class SolutionCache:
+    def __init__(self, path=DEFAULT_PATH, max_solutions=10000, memory_entries=256):
+        self.path = path
+        # Least recently used solutions beyond this many are evicted from
+        # disk, together with the states they index
+        self.max_solutions = max_solutions
+        self.memory_entries = memory_entries
+        # (problem, goal, state) -> (moves, stats), most recently used last
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Worker processes open their own connection
+        state = self.__dict__.copy()
+        state.update(_memory=OrderedDict(), _lock=None, _connection=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _key(self, problem, state=None):
+        # None when the problem has no int codec to key on
+        if state is None:
+            state = problem.get_initial_state()
+        state_key = problem.encode(state)
+        goal_key = problem.encode(problem.get_goal_state())
+        if not isinstance(state_key, int) or not isinstance(goal_key, int):
+            return None
+        return problem_key(problem), str(goal_key), str(state_key)
+
+    def get(self, problem, state=None):
+        # (moves, stats) of the stored solve whose path passes through the
+        # state (the initial state by default), or None
+        key = self._key(problem, state)
+        if key is None:
+            return None
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return list(hit[0]), dict(hit[1])
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT solutions.id, position, moves, stats FROM states "
+                "JOIN solutions ON solutions.id = states.solution "
+                "WHERE problem = ? AND goal = ? AND state = ?", key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            solution_id, position, moves, stats = row
+            with connection:
+                connection.execute("UPDATE solutions SET last_used = ? WHERE id = ?",
+                                   (time.time(), solution_id))
+            hit = (tuple(ast.literal_eval(moves)[position:]), json.loads(stats))
+            self._remember(key, hit)
+            self.hits += 1
+            return list(hit[0]), dict(hit[1])
+
+    def put(self, problem, solution, stats):
+        # Stores an optimal solution from the problem's initial state along
+        # with its stats dict (telemetry.SearchStats.as_dict())
+        key = self._key(problem)
+        if key is None:
+            return
+        name, goal, _ = key
+        encode = problem.encode
+        states = []
+        state = problem.get_initial_state()
+        for position, move in enumerate(solution):
+            states.append((str(encode(state)), position))
+            state = problem.apply_move(state, move)
+        states.append((str(encode(state)), len(solution)))
+        with self._lock:
+            self._remember(key, (tuple(solution), dict(stats)))
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    "INSERT INTO solutions (moves, stats, last_used) VALUES (?, ?, ?)",
+                    (repr(list(solution)), json.dumps(stats), time.time()))
+                solution_id = cursor.lastrowid
+                # States already on another stored path keep that entry
+                connection.executemany(
+                    "INSERT OR IGNORE INTO states VALUES (?, ?, ?, ?, ?)",
+                    [(name, goal, state_key, solution_id, position)
+                     for state_key, position in states])
+                self._evict(connection)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, connection):
+        count = connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        excess = count - self.max_solutions
+        if excess <= 0:
+            return
+        stale = [row[0] for row in connection.execute(
+            "SELECT id FROM solutions ORDER BY last_used LIMIT ?", (excess,))]
+        connection.executemany("DELETE FROM states WHERE solution = ?",
+                               [(solution_id,) for solution_id in stale])
+        connection.executemany("DELETE FROM solutions WHERE id = ?",
+                               [(solution_id,) for solution_id in stale])
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM states")
+                connection.execute("DELETE FROM solutions")
@@ -1,44 +1,694 @@
 from base_classes import State, Problem
 from collections import deque
-import heapq
+import math
+import os
 import time
+from batch_solver import solve_many
+from external_search import ExternalSearch
+from memory_bounded import BoundedFrontier, SMANode
+from open_list import HeapQueue, open_list_for
+from parallel_search import parallel_a_star
+from telemetry import SearchStats, TimedProblem, reset_peak_memory
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+def solution_length(solution):
+    # Streamed solutions can be longer than len() allows (sys.maxsize) and
+    # then give their length as an attribute
+    length = getattr(solution, "length", None)
+    return len(solution) if length is None else length
 
 
 class InferenceEngine:
-    def __init__(self, problem, max_moves=10000, timeout=120):
+    ALGORITHMS = ("astar", "ida*", "bidirectional", "hda*", "anytime", "sma*",
+                  "external", "direct", "batched")
+    # Algorithms whose solutions are shortest when the heuristic is
+    # admissible; only these are stored in a cache, and only for problems
+    # whose heuristic_is_admissible()
+    OPTIMAL = ("astar", "ida*", "bidirectional", "hda*", "sma*", "external",
+               "batched")
+    # Algorithms that start processes of their own, which daemonic
+    # processes are not allowed to do
+    MULTIPROCESS = ("hda*",)
+
+    def __init__(self, problem, max_moves=10000, timeout=120, algorithm="astar",
+                 workers=1, observer=None, report_every=1000, profile=False,
+                 weights=(3.0, 2.0, 1.5, 1.25, 1.0), memory_limit=64 * 2 ** 20,
+                 work_dir=None, buffer_size=16 * 2 ** 20, cache=None,
+                 cancel_event=None, batch_size=256):
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
         self.problem = problem
         self.max_moves = max_moves
         self.timeout = timeout
+        self.algorithm = algorithm
+        # hda* only: number of worker processes
+        self.workers = workers
+        # IDA* only: one {"threshold", "nodes"} entry per iteration
+        self.iterations = []
+        # anytime only: the decreasing weights on h, the proven bound on
+        # cost(incumbent) / cost(optimal) and one entry per improved solution
+        self.weights = weights
+        self.suboptimality_bound = None
+        self.incumbents = []
+        # sma* only: bytes the search's own nodes, tables and open list may
+        # hold; see memory_bounded.py for what is counted
+        self.memory_limit = memory_limit
+        # external only: where layer files go (a temporary directory inside
+        # work_dir, removed afterwards), the bytes of children buffered in
+        # memory before a sorted run is written, and one I/O entry per layer
+        # as described in external_search.py plus the bound it ran under
+        self.work_dir = work_dir
+        self.buffer_size = buffer_size
+        self.layers = []
+        # batched only: the most nodes of equal f expanded together
+        self.batch_size = batch_size
+        # Optional solution_cache.SolutionCache consulted before searching;
+        # optimal solutions are added to it
+        self.cache = cache
+        # observer(stats) is called with the live telemetry.SearchStats every
+        # `report_every` expansions. Observing or profile=True also times the
+        # problem's calls, which costs a few percent of throughput.
+        self.observer = observer
+        self.report_every = report_every
+        self.profile = profile
+        # Anything with is_set(), e.g. a threading or multiprocessing Event.
+        # It is checked every `report_every` expansions; once set, solve()
+        # stops and returns no solution (anytime: its incumbent).
+        self.cancel_event = cancel_event
+        self.stats = None
+        # Final SearchStats of the last solve()
+        self.summary = None
+
+    @classmethod
+    def solve_many(cls, problems, workers=None, **options):
+        # Solves many instances across a pool of worker processes and yields
+        # (instance_id, solution, moves, time) as each one finishes. The ids
+        # are the keys when `problems` is a mapping, positions otherwise.
+        # `options` are passed to each engine; an instance that overruns its
+        # timeout is reported with solution None.
+        options.setdefault("timeout", 120)
+        return solve_many(cls, problems, workers or os.cpu_count() or 1, options)
 
     def solve(self):
-        def a_star(initial_state):
+        search = {"astar": self._a_star, "ida*": self._ida_star,
+                  "bidirectional": self._bidirectional,
+                  "hda*": self._hda_star,
+                  "anytime": self._anytime,
+                  "sma*": self._sma_star,
+                  "external": self._external,
+                  "direct": self._direct,
+                  "batched": self._batched}[self.algorithm]
+        problem = self.problem
+        if self.cache is not None:
             start_time = time.time()
-            frontier = [(0, 0, initial_state, [])]
-            visited = set()
-            moves = 0
+            hit = self.cache.get(problem)
+            if hit is not None:
+                solution, stored = hit
+                self.stats = SearchStats.from_dict(stored)
+                self.stats.cached = True
+                self.stats.solution_length = solution_length(solution)
+                self.summary = self.stats
+                return solution, 0, time.time() - start_time
+        self.stats = SearchStats(self.algorithm)
+        # Each solve's peak_memory is its own where the peak can be reset
+        reset_peak_memory()
+        if (self.profile or self.observer is not None) and self.algorithm != "hda*":
+            self.problem = TimedProblem(problem, self.stats.timings)
+        start_time = time.time()
+        initial_state = problem.get_initial_state()
+        try:
+            if problem.is_dead_end(initial_state):
+                solution, moves_explored, time_taken = None, 0, time.time() - start_time
+            else:
+                solution, moves_explored, time_taken = search(initial_state)
+        except SearchCancelled:
+            solution, moves_explored, time_taken = \
+                None, self.stats.expanded, time.time() - start_time
+        finally:
+            self.problem = problem
+
+        self.stats.expanded = moves_explored
+        if solution is not None:
+            self.stats.solution_length = solution_length(solution)
+        self.stats.update()
+        self.summary = self.stats
+        optimal = self.algorithm in self.OPTIMAL or self.suboptimality_bound == 1.0
+        if self.cache is not None and solution is not None and optimal and \
+                problem.heuristic_is_admissible():
+            self.cache.put(problem, solution, self.stats.as_dict())
+        return solution, moves_explored, time_taken
+
+    def _report(self):
+        if self.observer is not None:
+            self.stats.update()
+            self.observer(self.stats)
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.stats.cancelled = True
+            raise SearchCancelled()
+
+    def _a_star(self, initial_state):
+        start_time = time.time()
+        goal_state = self.problem.get_goal_state()
+        encode = self.problem.encode
+        initial_h = self.problem.heuristic(initial_state)
+        frontier = open_list_for(initial_h)
+        frontier.push(initial_h, 0, initial_state)
+        # encoded state -> (encoded parent, move, g); paths are rebuilt once
+        # at the goal, so the table never holds State objects
+        parents = {encode(initial_state): (None, None, 0)}
+        moves = 0
+        solution = None
+        stats = self.stats
+
+        while frontier and moves < self.max_moves and (time.time() - start_time) < self.timeout:
+            priority, cost, state = frontier.pop()
+            key = encode(state)
+
+            # Stale entry: a cheaper path to this state was pushed later
+            if cost > parents[key][2]:
+                continue
+
+            if state.is_goal(goal_state):
+                solution = self._reconstruct_path(parents, key)
+                break
+
+            moves += 1
+            stats.expanded = moves
+            stats.f_bound = priority
+            if cost > stats.max_depth:
+                stats.max_depth = cost
+            if moves % self.report_every == 0:
+                stats.open_size = len(frontier)
+                stats.closed_size = len(parents)
+                self._report()
+
+            for move in self.problem.get_possible_moves(state):
+                new_state = self.problem.apply_move(state, move)
+                stats.generated += 1
+                new_cost = cost + 1
+                new_key = encode(new_state)
+                known = parents.get(new_key)
+                if known is not None and known[2] <= new_cost:
+                    stats.duplicates += 1
+                    continue
+                parents[new_key] = (key, move, new_cost)
+                priority = new_cost + self.problem.heuristic(new_state)
+                frontier.push(priority, new_cost, new_state)
+
+        stats.open_size = len(frontier)
+        stats.closed_size = len(parents)
+        return solution, moves, time.time() - start_time
+
+    def _ida_star(self, initial_state):
+        start_time = time.time()
+        goal_state = self.problem.get_goal_state()
+        encode = self.problem.encode
+        self.iterations = []
+        threshold = self.problem.heuristic(initial_state)
+        moves = 0
+        stats = self.stats
+
+        while moves < self.max_moves and (time.time() - start_time) < self.timeout:
+            # Only the current path is kept: states for cycle checks, one
+            # move iterator per level and the moves taken so far.
+            path_states = [initial_state]
+            on_path = {encode(initial_state)}
+            iterators = [iter(self.problem.get_possible_moves(initial_state))]
+            path = []
+            next_threshold = math.inf
+            nodes = 1
+            moves += 1
+            stats.f_bound = threshold
 
-            while frontier and moves < self.max_moves and (time.time() - start_time) < self.timeout:
-                _, cost, state, path = heapq.heappop(frontier)
+            if initial_state.is_goal(goal_state):
+                self.iterations.append({"threshold": threshold, "nodes": nodes})
+                return path, moves, time.time() - start_time
 
-                if state in visited:
+            while iterators:
+                if moves >= self.max_moves or (time.time() - start_time) >= self.timeout:
+                    self.iterations.append({"threshold": threshold, "nodes": nodes})
+                    return None, moves, time.time() - start_time
+
+                move = next(iterators[-1], None)
+                if move is None:
+                    iterators.pop()
+                    on_path.discard(encode(path_states.pop()))
+                    if path:
+                        path.pop()
+                    continue
+
+                new_state = self.problem.apply_move(path_states[-1], move)
+                stats.generated += 1
+                new_key = encode(new_state)
+                if new_key in on_path:
+                    stats.duplicates += 1
+                    continue
+                g = len(path) + 1
+                f = g + self.problem.heuristic(new_state)
+                if f > threshold:
+                    next_threshold = min(next_threshold, f)
                     continue
-                visited.add(state)
 
-                if state.is_goal(self.problem.get_goal_state()):
+                path.append(move)
+                nodes += 1
+                moves += 1
+                stats.expanded = moves
+                stats.closed_size = len(path)
+                if g > stats.max_depth:
+                    stats.max_depth = g
+                if moves % self.report_every == 0:
+                    self._report()
+                if new_state.is_goal(goal_state):
+                    self.iterations.append({"threshold": threshold, "nodes": nodes})
                     return path, moves, time.time() - start_time
 
+                path_states.append(new_state)
+                on_path.add(new_key)
+                iterators.append(
+                    iter(self.problem.get_possible_moves(new_state)))
+
+            self.iterations.append({"threshold": threshold, "nodes": nodes})
+            if next_threshold == math.inf:
+                break
+            threshold = next_threshold
+
+        return None, moves, time.time() - start_time
+
+    def _bidirectional(self, initial_state):
+        # Meet-in-the-middle BFS: grow whichever frontier is smaller by one
+        # full layer, backwards through get_predecessor_moves. Finishing the
+        # layer in which the searches first meet keeps the path shortest.
+        start_time = time.time()
+        goal_state = self.problem.get_goal_state()
+        if initial_state.is_goal(goal_state):
+            return [], 0, time.time() - start_time
+
+        # Both tables are keyed by encoded state.
+        # forward: key -> (parent key, move, depth) as in _a_star
+        # backward: key -> (key of next state towards the goal, move, depth)
+        encode = self.problem.encode
+        forward = {encode(initial_state): (None, None, 0)}
+        backward = {encode(goal_state): (None, None, 0)}
+        forward_layer = [initial_state]
+        backward_layer = [goal_state]
+        moves = 0
+        stats = self.stats
+
+        while forward_layer and backward_layer:
+            expand_forward = len(forward_layer) <= len(backward_layer)
+            layer, tree, other = (forward_layer, forward, backward) if expand_forward \
+                else (backward_layer, backward, forward)
+            next_layer = []
+            best = None
+            # Longest path the two trees can currently join into
+            stats.f_bound = stats.max_depth = \
+                forward[encode(forward_layer[0])][2] + backward[encode(backward_layer[0])][2] + 1
+
+            for state in layer:
+                if moves >= self.max_moves or (time.time() - start_time) >= self.timeout:
+                    return None, moves, time.time() - start_time
                 moves += 1
-                for move in self.problem.get_possible_moves(state):
-                    new_state = self.problem.apply_move(state, move)
-                    if new_state not in visited:
+                stats.expanded = moves
+                if moves % self.report_every == 0:
+                    stats.open_size = len(layer) + len(next_layer)
+                    stats.closed_size = len(forward) + len(backward)
+                    self._report()
+                key = encode(state)
+                depth = tree[key][2] + 1
+                if expand_forward:
+                    neighbours = [(self.problem.apply_move(state, move), move)
+                                  for move in self.problem.get_possible_moves(state)]
+                else:
+                    neighbours = self.problem.get_predecessor_moves(state)
+                for new_state, move in neighbours:
+                    stats.generated += 1
+                    new_key = encode(new_state)
+                    if new_key in tree:
+                        stats.duplicates += 1
+                        continue
+                    tree[new_key] = (key, move, depth)
+                    next_layer.append(new_state)
+                    if new_key in other:
+                        length = depth + other[new_key][2]
+                        if best is None or length < best[0]:
+                            best = (length, new_key)
+
+            if best is not None:
+                path = self._reconstruct_path(forward, best[1])
+                key = best[1]
+                while backward[key][0] is not None:
+                    key, move, _ = backward[key]
+                    path.append(move)
+                return path, moves, time.time() - start_time
+
+            if expand_forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
+        return None, moves, time.time() - start_time
+
+    def _anytime(self, initial_state):
+        # ARA*: weighted A* with f' = g + w * h, run again with each smaller
+        # weight. Search effort is reused between runs: g-values and parents
+        # are kept, and states improved after they were closed wait in
+        # `inconsistent` for the next run instead of being re-expanded. The
+        # best solution so far is returned when a limit is hit.
+        start_time = time.time()
+        goal_state = self.problem.get_goal_state()
+        encode = self.problem.encode
+        heuristic = self.problem.heuristic
+        stats = self.stats
+        self.incumbents = []
+        self.suboptimality_bound = None
+
+        parents = {encode(initial_state): (None, None, 0)}
+        open_states = {encode(initial_state): initial_state}
+        inconsistent = {}
+        goal_key = None
+        goal_cost = math.inf
+        moves = 0
+        cancelled = False
+
+        for weight in self.weights:
+            if self.suboptimality_bound is not None and weight >= self.suboptimality_bound:
+                continue
+            open_states.update(inconsistent)
+            inconsistent = {}
+            frontier = HeapQueue()
+            for key, state in open_states.items():
+                g = parents[key][2]
+                frontier.push(g + weight * heuristic(state), g, key)
+            closed = set()
+            stats.f_bound = weight
+            finished = False
+
+            try:
+                while True:
+                    if not frontier:
+                        finished = True
+                        break
+                    if moves >= self.max_moves or (time.time() - start_time) >= self.timeout:
+                        break
+                    priority, cost, key = frontier.pop()
+                    if priority >= goal_cost:
+                        # No open state can lead to a cheaper goal under this
+                        # weight; it stays in open_states for the next run
+                        finished = True
+                        break
+                    state = open_states.get(key)
+                    if state is None or cost != parents[key][2]:
+                        continue
+                    del open_states[key]
+                    closed.add(key)
+                    if state.is_goal(goal_state):
+                        continue
+
+                    moves += 1
+                    stats.expanded = moves
+                    if cost > stats.max_depth:
+                        stats.max_depth = cost
+                    if moves % self.report_every == 0:
+                        stats.open_size = len(open_states)
+                        stats.closed_size = len(parents)
+                        self._report()
+
+                    for move in self.problem.get_possible_moves(state):
+                        new_state = self.problem.apply_move(state, move)
+                        stats.generated += 1
                         new_cost = cost + 1
-                        new_path = path + [move]
-                        priority = new_cost + self.problem.heuristic(new_state)
-                        heapq.heappush(
-                            frontier, (priority, new_cost, new_state, new_path))
+                        new_key = encode(new_state)
+                        known = parents.get(new_key)
+                        if known is not None and known[2] <= new_cost:
+                            stats.duplicates += 1
+                            continue
+                        parents[new_key] = (key, move, new_cost)
+                        if new_state.is_goal(goal_state) and new_cost < goal_cost:
+                            goal_key, goal_cost = new_key, new_cost
+                        if new_key in closed:
+                            inconsistent[new_key] = new_state
+                        else:
+                            open_states[new_key] = new_state
+                            frontier.push(new_cost + weight * heuristic(new_state),
+                                          new_cost, new_key)
+            except SearchCancelled:
+                cancelled = True
 
-            return None, moves, time.time() - start_time
+            if goal_key is not None:
+                # The goal's g is only set when it is generated, but a later
+                # run can shorten the path to it by improving its ancestors;
+                # the path rebuilt through them is the real incumbent
+                solution = self._reconstruct_path(parents, goal_key)
+                goal_cost = len(solution)
+                parent, move, _ = parents[goal_key]
+                parents[goal_key] = (parent, move, goal_cost)
+                # cost / min(g + h) over unexpanded states bounds the ratio to
+                # the optimum; it is at most this run's weight once finished
+                pending = list(open_states.items()) + list(inconsistent.items())
+                lower = min((parents[key][2] + heuristic(state) for key, state in pending),
+                            default=goal_cost)
+                bound = goal_cost / lower if lower > 0 else 1.0
+                if finished:
+                    bound = min(bound, weight)
+                bound = max(bound, 1.0)
+                if not self.incumbents or goal_cost < self.incumbents[-1]["cost"] or \
+                        bound < self.suboptimality_bound:
+                    self.incumbents.append({"cost": goal_cost, "weight": weight,
+                                            "bound": bound, "expanded": moves,
+                                            "time": time.time() - start_time})
+                self.suboptimality_bound = bound
+                stats.suboptimality_bound = bound
+                if not cancelled:
+                    # A cancel raised here still returns the incumbent
+                    try:
+                        self._report()
+                    except SearchCancelled:
+                        cancelled = True
+            if cancelled or not finished or self.suboptimality_bound == 1.0:
+                break
 
-        solution, moves_explored, time_taken = a_star(
-            self.problem.get_initial_state())
-        return solution, moves_explored, time_taken
+        solution = self._reconstruct_path(parents, goal_key) if goal_key is not None else None
+        return solution, moves, time.time() - start_time
+
+    def _sma_star(self, initial_state):
+        # SMA*: A* inside memory_limit bytes. While over budget the worst
+        # leaf (highest f, then shallowest) is forgotten and its f backed up
+        # into its parent, which is reopened so the forgotten subtree can be
+        # regenerated if it becomes the best option again. Returns None if
+        # the budget cannot hold even a single path to the next node.
+        start_time = time.time()
+        goal_state = self.problem.get_goal_state()
+        encode = self.problem.encode
+        heuristic = self.problem.heuristic
+        stats = self.stats
+        stats.memory_used = 0
+        stats.pruned = 0
+        frontier = BoundedFrontier()
+        root = SMANode(initial_state, encode(initial_state), None, None, 0,
+                       heuristic(initial_state))
+        frontier.add(root)
+        frontier.push(root)
+        moves = 0
+        solution = None
+
+        while moves < self.max_moves and (time.time() - start_time) < self.timeout:
+            node = frontier.pop_best()
+            if node is None or node.f == math.inf:
+                break
+            if node.state.is_goal(goal_state):
+                solution = node.path()
+                break
+
+            moves += 1
+            stats.expanded = moves
+            stats.f_bound = node.f
+            if node.g > stats.max_depth:
+                stats.max_depth = node.g
+            if moves % self.report_every == 0:
+                stats.open_size = frontier.open_count
+                stats.closed_size = frontier.node_count
+                self._report()
+
+            # A reopened node only regenerates the children it forgot
+            remembered = {child.key for child in node.children}
+            for move in self.problem.get_possible_moves(node.state):
+                new_state = self.problem.apply_move(node.state, move)
+                stats.generated += 1
+                new_key = encode(new_state)
+                if new_key in remembered:
+                    continue
+                new_cost = node.g + 1
+                known = frontier.nodes.get(new_key)
+                if known is not None and known.g <= new_cost:
+                    stats.duplicates += 1
+                    continue
+                # pathmax keeps f monotone along every path
+                child = SMANode(new_state, new_key, node, move, new_cost,
+                                max(node.f, new_cost + heuristic(new_state)))
+                node.children.append(child)
+                frontier.add(child)
+                frontier.push(child)
+            node.forgotten_f = math.inf
+            frontier.recount(node)
+            self._back_up(node, frontier)
+            if not node.children:
+                # Dead end: kept open with f = inf so it is pruned first
+                frontier.push(node)
+
+            used = frontier.bytes_used
+            while used > self.memory_limit:
+                leaf = frontier.pop_worst_leaf(root)
+                if leaf is None:
+                    stats.memory_used = max(stats.memory_used, used)
+                    return None, moves, time.time() - start_time
+                parent = leaf.parent
+                parent.children.remove(leaf)
+                parent.forgotten_f = min(parent.forgotten_f, leaf.f)
+                frontier.recount(parent)
+                frontier.remove(leaf)
+                stats.pruned += 1
+                if not parent.in_open:
+                    frontier.push(parent)
+                used = frontier.bytes_used
+            stats.memory_used = max(stats.memory_used, used)
+
+        stats.open_size = frontier.open_count
+        stats.closed_size = frontier.node_count
+        return solution, moves, time.time() - start_time
+
+    def _back_up(self, node, frontier):
+        # f of a node is the lowest f among its remembered and forgotten
+        # children; changes propagate towards the root
+        while node is not None:
+            f = min(node.forgotten_f, min((child.f for child in node.children),
+                                          default=math.inf))
+            if f == node.f:
+                break
+            node.f = f
+            if node.in_open:
+                frontier.push(node)
+            node = node.parent
+
+    def _external(self, initial_state):
+        # Breadth-first iterative deepening on disk: an external BFS that
+        # prunes g + h > bound, rerun with the lowest pruned f until the goal
+        # layer is reached. Only the read buffer and the run buffer live in
+        # memory; the problem must provide key_size() and invert_move().
+        start_time = time.time()
+        stats = self.stats
+        self.layers = []
+        bound = self.problem.heuristic(initial_state)
+        moves = 0
+
+        while True:
+            stats.f_bound = bound
+            with ExternalSearch(self.problem, self.work_dir, self.buffer_size,
+                                stats, self._report, self.report_every) as search:
+                depth = search.run(bound, self.max_moves - moves,
+                                   start_time + self.timeout)
+                moves += search.expanded
+                self.layers.extend(dict(layer, bound=bound) for layer in search.layers)
+                if depth is not None:
+                    return search.path(), moves, time.time() - start_time
+                if search.limited or search.next_bound == math.inf:
+                    return None, moves, time.time() - start_time
+                bound = search.next_bound
+
+    def _direct(self, initial_state):
+        # Domains that know their solution in closed form (see
+        # Problem.direct_solution); it may be a lazy sequence of moves
+        start_time = time.time()
+        solution = self.problem.direct_solution(initial_state)
+        return solution, 0, time.time() - start_time
+
+    def _batched(self, initial_state):
+        # A* over tile puzzles (see Problem.tile_layout) that pops up to
+        # batch_size nodes of the lowest f and expands them together with
+        # batched_search.TileBatch. Nodes sharing the lowest f may be
+        # expanded in any order, so the first goal popped is still optimal.
+        # Imported here so that NumPy is only loaded when this mode is used
+        from batched_search import TileBatch
+        start_time = time.time()
+        batch = TileBatch(*self.problem.tile_layout())
+        stats = self.stats
+        boards = batch.boards([initial_state, self.problem.get_goal_state()])
+        initial_key, goal_key = batch.keys(boards)
+        initial_h = int(batch.heuristic(boards[:1])[0])
+        frontier = open_list_for(initial_h)
+        frontier.push(initial_h, 0, initial_key)
+        parents = {initial_key: (None, None, 0)}
+        moves = 0
+
+        while frontier and moves < self.max_moves and (time.time() - start_time) < self.timeout:
+            limit = min(self.batch_size, self.max_moves - moves)
+            bound, cost, key = frontier.pop()
+            keys = []
+            costs = []
+            while True:
+                # Stale entries are skipped as in _a_star
+                if cost <= parents[key][2]:
+                    if key == goal_key:
+                        return self._reconstruct_path(parents, key), moves, \
+                            time.time() - start_time
+                    keys.append(key)
+                    costs.append(cost)
+                    if len(keys) == limit:
+                        break
+                if not frontier:
+                    break
+                priority, cost, key = frontier.pop()
+                if priority != bound:
+                    frontier.push(priority, cost, key)
+                    break
+            if not keys:
+                continue
+
+            reported = moves // self.report_every
+            moves += len(keys)
+            stats.expanded = moves
+            stats.f_bound = bound
+            stats.max_depth = max(stats.max_depth, max(costs))
+            if moves // self.report_every != reported:
+                stats.open_size = len(frontier)
+                stats.closed_size = len(parents)
+                self._report()
+
+            rows, cells, children = batch.expand(batch.decode(keys))
+            child_keys = batch.keys(children)
+            stats.generated += len(child_keys)
+            for child_key, known, row, cell, h in zip(
+                    child_keys, map(parents.get, child_keys), rows.tolist(),
+                    cells.tolist(), batch.heuristic(children).tolist()):
+                new_cost = costs[row] + 1
+                if known is not None and known[2] <= new_cost:
+                    stats.duplicates += 1
+                    continue
+                parents[child_key] = (keys[row], cell, new_cost)
+                frontier.push(new_cost + h, new_cost, child_key)
+
+        stats.open_size = len(frontier)
+        stats.closed_size = len(parents)
+        return None, moves, time.time() - start_time
+
+    def _hda_star(self, initial_state):
+        # The problem is pickled to each worker, which rebuilds its own
+        # initial state, so initial_state is only used by the other modes
+        result = parallel_a_star(self.problem, self.workers, self.max_moves,
+                                 self.timeout, cancel_event=self.cancel_event)
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.stats.cancelled = True
+        return result
+
+    def _reconstruct_path(self, parents, key):
+        path = []
+        parent, move, _ = parents[key]
+        while parent is not None:
+            path.append(move)
+            key = parent
+            parent, move, _ = parents[key]
+        path.reverse()
+        return path
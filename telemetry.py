@@ -0,0 +1,140 @@
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TIMED_CALLS = ("get_possible_moves", "apply_move", "heuristic", "encode")
+
+
+def reset_peak_memory():
+    # Linux only: restart the peak from the current resident size, so that
+    # peak_memory() covers what follows. Elsewhere the peak stays the
+    # highest seen by the process.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_memory():
+    # Peak resident set size of this process in bytes, None where unknown
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SearchStats:
+    # Live counters for one solve. The engine hands this object to its
+    # observer every `report_every` expansions and keeps it afterwards as
+    # engine.summary. Observers that keep a sample should call as_dict().
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.start_time = time.time()
+        self.elapsed = 0.0
+        self.expanded = 0
+        self.generated = 0
+        # Children dropped because their state was already recorded at an
+        # equal or lower cost
+        self.duplicates = 0
+        self.open_size = 0
+        # States with a recorded parent (A*), or on the current path (IDA*)
+        self.closed_size = 0
+        self.f_bound = None
+        self.max_depth = 0
+        # Seconds spent inside each Problem call; only filled in when the
+        # engine profiles. "encode" is the cost of hashing states.
+        self.timings = dict.fromkeys(TIMED_CALLS, 0.0)
+        self.peak_memory = None
+        self.solution_length = None
+        # Anytime search only: proven cost(incumbent) / cost(optimal)
+        self.suboptimality_bound = None
+        # SMA* only: peak bytes charged against the memory limit and the
+        # number of nodes forgotten to stay under it
+        self.memory_used = None
+        self.pruned = None
+        # True when the solution came from a SolutionCache; the other
+        # counters are then those of the solve that stored it
+        self.cached = False
+        # True when the engine's cancel_event stopped the solve
+        self.cancelled = False
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls(values["algorithm"])
+        for name, value in values.items():
+            if name != "expansions_per_second":
+                setattr(stats, name, value)
+        return stats
+
+    @property
+    def expansions_per_second(self):
+        return self.expanded / self.elapsed if self.elapsed > 0 else 0.0
+
+    def update(self):
+        self.elapsed = time.time() - self.start_time
+        self.peak_memory = peak_memory()
+
+    def as_dict(self):
+        return {
+            "algorithm": self.algorithm,
+            "elapsed": self.elapsed,
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "open_size": self.open_size,
+            "closed_size": self.closed_size,
+            "f_bound": self.f_bound,
+            "max_depth": self.max_depth,
+            "expansions_per_second": self.expansions_per_second,
+            "timings": dict(self.timings),
+            "peak_memory": self.peak_memory,
+            "solution_length": self.solution_length,
+            "suboptimality_bound": self.suboptimality_bound,
+            "memory_used": self.memory_used,
+            "pruned": self.pruned,
+            "cached": self.cached,
+            "cancelled": self.cancelled,
+        }
+
+
+class TimedProblem:
+    # Stands in for a Problem during a profiled solve and adds the time of
+    # each engine-facing call to `timings`; everything else passes through
+    def __init__(self, problem, timings):
+        self._problem = problem
+        self._timings = timings
+
+    def __getattr__(self, name):
+        if name == "_problem":
+            raise AttributeError(name)
+        return getattr(self._problem, name)
+
+    def _timed(self, name, *args):
+        start = time.perf_counter()
+        result = getattr(self._problem, name)(*args)
+        self._timings[name] += time.perf_counter() - start
+        return result
+
+    def get_possible_moves(self, state):
+        return self._timed("get_possible_moves", state)
+
+    def apply_move(self, state, move):
+        return self._timed("apply_move", state, move)
+
+    def heuristic(self, state):
+        return self._timed("heuristic", state)
+
+    def encode(self, state):
+        return self._timed("encode", state)
@@ -1,5 +1,8 @@
 from base_classes import State, Problem
-from typing import List, Tuple
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from typing import Iterator, List, Optional, Sequence, Tuple
 # Updated 9/15/2024
 
 
@@ -8,7 +11,7 @@ class TowerOfHanoiState(State):
         self.pegs = pegs
 
     def is_valid(self):
-        return len(self.pegs) == 3 and all(peg == sorted(peg, reverse=True) for peg in self.pegs)
+        return len(self.pegs) >= 3 and all(peg == sorted(peg, reverse=True) for peg in self.pegs)
 
     def is_goal(self, goal_state):
         return self.pegs == goal_state.pegs
@@ -30,13 +33,123 @@ class TowerOfHanoiState(State):
         return sum(len(peg) for peg in self.pegs[:-1])
 
 
+@lru_cache(maxsize=None)
+def frame_stewart(num_disks: int, num_pegs: int) -> Tuple[int, int]:
+    # (moves, split): the fewest moves for a tower of num_disks on num_pegs
+    # pegs by Frame-Stewart, and how many disks to park first. With 3 pegs
+    # this is the classic 2^n - 1, which is optimal; with 4 pegs the
+    # Frame-Stewart count is proven optimal.
+    if num_disks == 0:
+        return 0, 0
+    if num_pegs == 3 or num_disks == 1:
+        return 2 ** num_disks - 1, num_disks - 1
+    best = None
+    for split in range(1, num_disks):
+        moves = 2 * frame_stewart(split, num_pegs)[0] + \
+            frame_stewart(num_disks - split, num_pegs - 1)[0]
+        if best is None or moves < best[0]:
+            best = (moves, split)
+    return best
+
+
+class TowerMoves:
+    # The moves that carry the smallest num_disks disks from pegs[0] to
+    # pegs[1], the other pegs being free to use. Indexing is O(1) with three
+    # pegs and O(num_disks) with more, so nothing is materialised. len()
+    # stops at sys.maxsize (63 disks on three pegs); `length` does not.
+    def __init__(self, num_disks: int, pegs: Tuple[int, ...]):
+        self.num_disks = num_disks
+        self.pegs = pegs
+        self.length, self._split = frame_stewart(num_disks, len(pegs))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _parts(self) -> List["TowerMoves"]:
+        # Park the top `split` disks on pegs[2], move the rest without
+        # that peg, then bring the parked disks over
+        source, destination, parking = self.pegs[0], self.pegs[1], self.pegs[2]
+        rest = self.pegs[3:]
+        split = self._split
+        return [TowerMoves(split, (source, parking, destination) + rest),
+                TowerMoves(self.num_disks - split, (source, destination) + rest),
+                TowerMoves(split, (parking, destination, source) + rest)]
+
+    def __getitem__(self, index: int) -> Tuple[int, int]:
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("move index out of range")
+        moves = self
+        while len(moves.pegs) > 3:
+            for part in moves._parts():
+                if index < part.length:
+                    moves = part
+                    break
+                index -= part.length
+        # Closed form of the three-peg recursion: move i goes from peg
+        # (i & (i - 1)) % 3 to ((i | (i - 1)) + 1) % 3, with the target
+        # labelled 2 for an odd number of disks and 1 for an even one
+        source, destination, spare = moves.pegs
+        labels = (source, spare, destination) if moves.num_disks % 2 else \
+            (source, destination, spare)
+        i = index + 1
+        return labels[(i & (i - 1)) % 3], labels[((i | (i - 1)) + 1) % 3]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        if len(self.pegs) == 3:
+            for index in range(self.length):
+                yield self[index]
+        elif self.num_disks:
+            for part in self._parts():
+                yield from part
+
+
+class HanoiSolution(Sequence):
+    # A solution streamed from a few move blocks (tower moves and single
+    # moves) instead of a list; len() and indexing work without expanding
+    # it. As with TowerMoves, `length` holds lengths len() cannot return.
+    def __init__(self, parts: List[Sequence]):
+        lengths = [part.length if isinstance(part, TowerMoves) else len(part)
+                   for part in parts]
+        self._parts = [part for part, length in zip(parts, lengths) if length]
+        self._starts = [0] + list(accumulate(length for length in lengths if length))
+        self.length = self._starts[-1]
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __bool__(self) -> bool:
+        return self.length > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("move index out of range")
+        part = bisect_right(self._starts, index) - 1
+        return self._parts[part][index - self._starts[part]]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for part in self._parts:
+            yield from part
+
+
 class TowerOfHanoiProblem(Problem):
-    def __init__(self, num_disks: int):
+    def __init__(self, num_disks: int, num_pegs: int = 3,
+                 initial_state: Optional[TowerOfHanoiState] = None):
         self.num_disks = num_disks
-        self._initial_state = TowerOfHanoiState(
-            [list(range(num_disks, 0, -1)), [], []])
+        self.num_pegs = num_pegs
+        # Bits per disk in encoded keys: enough for any peg index
+        self._bits = max(1, (num_pegs - 1).bit_length())
+        if initial_state is None:
+            initial_state = TowerOfHanoiState(
+                [list(range(num_disks, 0, -1))] + [[] for _ in range(num_pegs - 1)])
+        self._initial_state = initial_state
         self._goal_state = TowerOfHanoiState(
-            [[], [], list(range(num_disks, 0, -1))])
+            [[] for _ in range(num_pegs - 1)] + [list(range(num_disks, 0, -1))])
 
     def get_initial_state(self):
         return self._initial_state
@@ -46,8 +159,8 @@ class TowerOfHanoiProblem(Problem):
 
     def get_possible_moves(self, state: TowerOfHanoiState) -> List[Tuple[int, int]]:
         moves = []
-        for source in range(3):
-            for destination in range(3):
+        for source in range(len(state.pegs)):
+            for destination in range(len(state.pegs)):
                 if source != destination and state.pegs[source]:
                     if not state.pegs[destination] or state.pegs[source][-1] < state.pegs[destination][-1]:
                         moves.append((source, destination))
@@ -60,10 +173,91 @@ class TowerOfHanoiProblem(Problem):
         new_pegs[destination].append(disk)
         return TowerOfHanoiState(new_pegs)
 
+    def encode(self, state: TowerOfHanoiState) -> int:
+        # A fixed-width field per disk: the index of the peg holding it
+        key = 0
+        for peg_index, peg in enumerate(state.pegs):
+            for disk in peg:
+                key |= peg_index << (self._bits * (disk - 1))
+        return key
+
+    def decode(self, key: int) -> TowerOfHanoiState:
+        pegs = [[] for _ in range(self.num_pegs)]
+        mask = (1 << self._bits) - 1
+        for disk in range(self.num_disks, 0, -1):
+            pegs[(key >> (self._bits * (disk - 1))) & mask].append(disk)
+        return TowerOfHanoiState(pegs)
+
+    def signature(self) -> Tuple[int, int]:
+        return (self.num_disks, self.num_pegs)
+
+    def key_size(self) -> int:
+        return (self._bits * self.num_disks + 7) // 8
+
+    def invert_move(self, state: TowerOfHanoiState, move: Tuple[int, int]) -> Tuple[int, int]:
+        source, destination = move
+        return (destination, source)
+
     def get_move_description(self, move: Tuple[int, int], state: TowerOfHanoiState) -> str:
         source, destination = move
         disk = state.pegs[source][-1]
         return f"Move disk {disk} from peg {source} to peg {destination}"
 
     def heuristic(self, state: TowerOfHanoiState) -> int:
+        # Exact with three pegs, so A* walks straight down the optimal path;
+        # with more pegs the count of disks off the target peg
+        if self.num_pegs == 3:
+            return self._distance(state)
         return state.heuristic()
+
+    def _positions(self, state: TowerOfHanoiState) -> List[int]:
+        # positions[disk] = index of the peg holding it
+        positions = [0] * (self.num_disks + 1)
+        for peg_index, peg in enumerate(state.pegs):
+            for disk in peg:
+                positions[disk] = peg_index
+        return positions
+
+    def _distance(self, state: TowerOfHanoiState) -> int:
+        # Fewest three-peg moves to the goal: going from the largest disk
+        # down, a disk off the current target costs 2^(disk - 1) moves and
+        # the disks above it must first gather on the third peg
+        positions = self._positions(state)
+        target = self.num_pegs - 1
+        distance = 0
+        for disk in range(self.num_disks, 0, -1):
+            if positions[disk] != target:
+                distance += 2 ** (disk - 1)
+                target = 3 - positions[disk] - target
+        return distance
+
+    def direct_solution(self, state: TowerOfHanoiState) -> HanoiSolution:
+        # Optimal moves from any legal three-peg state, or Frame-Stewart
+        # moves for more pegs when all disks start on one peg, streamed
+        target = self.num_pegs - 1
+        if self.num_pegs == 3:
+            positions = self._positions(state)
+            blocks = []
+            for disk in range(self.num_disks, 0, -1):
+                source = positions[disk]
+                if source != target:
+                    spare = 3 - source - target
+                    # Moves for the smaller disks come first: they gather on
+                    # the spare peg before this disk can go
+                    blocks.append([(source, target),
+                                   TowerMoves(disk - 1, (spare, target, source))])
+                    target = spare
+            parts = []
+            for move, tower in reversed(blocks):
+                parts.extend([[move], tower])
+            return HanoiSolution(parts)
+        occupied = [index for index, peg in enumerate(state.pegs) if peg]
+        if len(occupied) > 1:
+            raise ValueError(
+                "Direct moves with more than three pegs need all disks on one peg")
+        if not occupied or occupied[0] == target:
+            return HanoiSolution([])
+        source = occupied[0]
+        others = tuple(index for index in range(self.num_pegs)
+                       if index not in (source, target))
+        return HanoiSolution([TowerMoves(self.num_disks, (source, target) + others)])
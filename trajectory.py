@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from solver import solution_length
+
+
+class Trajectory:
+    # The states along a solution, trajectory[0] being the initial state and
+    # trajectory[len(solution)] the goal. States are materialised a chunk at
+    # a time: the first state of every chunk reached so far is kept, and the
+    # most recently used chunks are cached whole. Stepping is O(1) amortised
+    # and a jump replays at most one chunk once its checkpoint is known.
+    def __init__(self, problem, solution, chunk_size=256, cached_chunks=8):
+        self.problem = problem
+        self.solution = solution
+        # Steps, goal included; can exceed what len() returns
+        self.length = solution_length(solution) + 1
+        self.chunk_size = chunk_size
+        self.cached_chunks = cached_chunks
+        self._checkpoints = [problem.get_initial_state()]
+        self._chunks = OrderedDict()
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, step):
+        if step < 0:
+            step += self.length
+        if not 0 <= step < self.length:
+            raise IndexError("step out of range")
+        index, offset = divmod(step, self.chunk_size)
+        chunk = self._chunks.get(index)
+        if chunk is None:
+            chunk = self._build_chunk(index)
+        else:
+            self._chunks.move_to_end(index)
+        return chunk[offset]
+
+    def _build_chunk(self, index):
+        # Checkpoints are filled in order, so a far jump replays every chunk
+        # before it once
+        while len(self._checkpoints) <= index:
+            self._build_chunk(len(self._checkpoints) - 1)
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.length)
+        state = self._checkpoints[index]
+        chunk = [state]
+        for step in range(start, end - 1):
+            state = self.problem.apply_move(state, self.solution[step])
+            chunk.append(state)
+        if end < self.length and len(self._checkpoints) == index + 1:
+            self._checkpoints.append(
+                self.problem.apply_move(state, self.solution[end - 1]))
+        self._chunks[index] = chunk
+        while len(self._chunks) > self.cached_chunks:
+            self._chunks.popitem(last=False)
+        return chunk
@@ -0,0 +1,25 @@
+import registry
+from solver import InferenceEngine
+
+# Kept apart from gui.py so that solver processes started with the spawn
+# method import neither tkinter nor any problem module they do not use.
+
+
+def run_solver(name, params, cache, events, cancel_event, algorithm="astar",
+               max_moves=10000, timeout=120):
+    # Runs on a worker thread or in a child process and talks to the caller
+    # only through `events`: ("progress", stats dict), then either
+    # ("done", (problem, solution, moves, time, stats dict)) or ("error",
+    # message). The problem is built here from its registry name and parsed
+    # params, since building can take long, e.g. new pattern databases.
+    try:
+        problem = registry.get(name).load()(**params)
+        engine = InferenceEngine(
+            problem, max_moves=max_moves, timeout=timeout, cache=cache,
+            algorithm=algorithm, cancel_event=cancel_event,
+            observer=lambda stats: events.put(("progress", stats.as_dict())))
+        solution, moves_explored, time_taken = engine.solve()
+        events.put(("done", (problem, solution, moves_explored, time_taken,
+                             engine.summary.as_dict())))
+    except Exception as e:
+        events.put(("error", str(e)))